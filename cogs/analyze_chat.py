@@ -1,108 +1,314 @@
+import hashlib
 import os
+import zipfile
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.errors import HTTPException
-from cogs.utils.chat_analyzer import process_chat_history
+from cogs.utils.chat_analyzer import (
+    ChannelStats, ChatAnalysis, ChatDataset, UserStats, analyze_export_file, build_analysis, channel_stats, merge_datasets, split_export_file, zip_exports,
+)
+from cogs.utils.backfill import counting_started
+from cogs.utils.chat_import import export_channel_id, import_dataset
+from cogs.utils.dataset_cache import DatasetCache, SourceStore
+from cogs.utils.downloads import DownloadTooLarge, download_to_file
+from cogs.utils.analysis_pool import AnalysisPool, PoolFull, ProgressReporter, latest_progress
+import asyncio
 from datetime import datetime
 import io
 
+# Seconds between edits of the status message while an analysis runs
+PROGRESS_EDIT_INTERVAL = 3.0
+# Exports at least this large are split into chunks parsed by several processes
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+class ExportSource(NamedTuple):
+    name: str           # channel name in the per-channel breakdown
+    key: str            # dataset cache key
+    path: str
+    size: int
+    member: Optional[str] = None  # the export inside the zip archive at path
+
+def channel_name(filename: str) -> str:
+    # DiscordChatExporter names files "Guild - Category - channel [id].html"
+    return os.path.splitext(os.path.basename(filename))[0]
+
+def format_top(top, unit) -> str:
+    return '\n'.join(f"<@{user_id}>: {count} {unit}" for user_id, count in top)
+
+def format_user_stats(user: UserStats) -> str:
+    lines = [
+        f"Total Messages: {user.messages}",
+        f"Total Words: {user.words}",
+        f"Total Attachments: {user.attachments}",
+    ]
+    year = None
+    for month_year, month, words, messages, attachments in user.months:
+        if month_year != year:
+            year = month_year
+            lines.append(f"Year {year}:")
+        lines.append(f"  Month {month:02d}: {words} words, {messages} messages, {attachments} attachments")
+    return '\n'.join(lines)
+
+def format_channels(channels: List[ChannelStats]) -> str:
+    return '\n'.join(f"{channel.name}: {channel.messages} messages, {channel.words} words, {channel.attachments} attachments" for channel in channels)
+
+def analysis_embed(analysis: ChatAnalysis, user_stats: bool = False) -> discord.Embed:
+    embed = discord.Embed(title="Chat Analysis Results", color=discord.Color.from_str('#af2202'))
+    embed.add_field(name="Overview", value=f"Total Messages: {analysis.messages}\nTotal Words: {analysis.words}\nTotal Attachments: {analysis.attachments}", inline=False)
+    embed.add_field(name="Top 10 Users by Word Count:", value=format_top(analysis.top_words, "words"), inline=False)
+    embed.add_field(name="Top 10 Users by Messages Sent:", value=format_top(analysis.top_messages, "messages"), inline=False)
+    embed.add_field(name="Top 10 Users by Attachments Sent:", value=format_top(analysis.top_attachments, "attachments"), inline=False)
+    if user_stats and analysis.channels:
+        embed.add_field(name="Channels:", value=format_channels(analysis.channels), inline=False)
+    if user_stats:
+        for user in analysis.users:
+            embed.add_field(name=f"Stats for <@{user.user_id}>", value=format_user_stats(user), inline=False)
+    return embed
+
+def user_stats_text(analysis: ChatAnalysis) -> str:
+    sections = [f"Channels:\n{format_channels(analysis.channels)}"] if analysis.channels else []
+    sections.extend(f"User: <@{user.user_id}>\nUsername: {user.name}\n{format_user_stats(user)}" for user in analysis.users)
+    return '\n\n'.join(sections)
+
 class AnalyzeChat(commands.Cog):
     def __init__(self, bot) -> None:
         self.bot = bot
+        self.pool = AnalysisPool(
+            workers=int(os.getenv('ANALYZE_WORKERS', 2)),
+            max_queued=int(os.getenv('ANALYZE_QUEUE_SIZE', 10)),
+            processes=int(os.getenv('ANALYZE_PROCESSES', 0)) or None,
+        )
+        self.cache = DatasetCache(
+            os.getenv('ANALYZE_CACHE_DIR', 'analysis_cache'),
+            int(os.getenv('ANALYZE_CACHE_MB', 256)) * 1024 * 1024,
+        )
+        self.max_bytes = int(os.getenv('ANALYZE_MAX_MB', 100)) * 1024 * 1024
+        # What zip archives may hold once decompressed
+        self.max_unzipped_bytes = int(os.getenv('ANALYZE_MAX_UNZIPPED_MB', 1024)) * 1024 * 1024
+        self.sources = SourceStore(os.getenv('ANALYZE_SOURCES_DIR', 'analysis_sources'))
+        self.source_locks: Dict[Tuple[int, str], asyncio.Lock] = defaultdict(asyncio.Lock)
         print('AnalyzeChat cog loaded')
+
+    async def cog_load(self) -> None:
+        self.session = aiohttp.ClientSession()
+
+    async def cog_unload(self) -> None:
+        self.pool.shutdown()
+        await self.session.close()
+
+    def merge_into_source(self, guild_id: int, name: str, datasets: List[ChatDataset], reset: bool) -> Tuple[ChatDataset, int]:
+        """Adds the messages of ``datasets`` a stored source has not seen, returns the source and how many were added"""
+        if reset:
+            self.sources.delete(guild_id, name)
+        history = self.sources.load(guild_id, name)
+        added = sum(history.merge_new(dataset) for dataset in datasets)
+        if added:
+            self.sources.save(guild_id, name, history)
+        return history, added
+
+    async def import_exports(self, guild_id: int, sources: List[ExportSource], datasets: List[ChatDataset], channel, start_date, end_date) -> Tuple[int, List[str]]:
+        """Adds the exports to the counters of their channels, returns how many messages were new and the exports without a channel"""
+        config = self.bot.config.get(guild_id)
+        # Messages counted live are skipped through their ledger entries, pending ones included
+        await self.bot.ledger.flush()
+        imported = 0
+        unmapped = []
+        for export, dataset in zip(sources, datasets):
+            channel_id = channel.id if channel is not None else export_channel_id(export.name)
+            channel_id = config.route_id(channel_id) if channel_id is not None else None
+            if channel_id is None:
+                unmapped.append(export.name)
+                continue
+            # Everything from when counting started was counted live, like a backfill the import stops there
+            before = await counting_started(self.bot.db, guild_id, channel_id)
+            imported += await import_dataset(self.bot.db, guild_id, channel_id, dataset, start_date, end_date, before)
+        return imported, unmapped
+
+    async def download_sources(self, attachments, paths: List[str]) -> List[ExportSource]:
+        """Downloads the attachments, adding every temp file to ``paths``, and lists the exports in them"""
+        sources = []
+        remaining = self.max_bytes
+        for attachment in attachments:
+            path, key = await download_to_file(self.session, attachment.url, remaining, suffix=os.path.splitext(attachment.filename)[1])
+            paths.append(path)
+            size = os.path.getsize(path)
+            remaining -= size
+            if not attachment.filename.lower().endswith('.zip'):
+                sources.append(ExportSource(channel_name(attachment.filename), key, path, size))
+                continue
+            # Entries are decompressed as they are parsed, only their sizes are read here
+            for member, member_size in await asyncio.to_thread(zip_exports, path):
+                member_key = hashlib.sha256(f'{key}/{member}'.encode()).hexdigest()
+                sources.append(ExportSource(channel_name(member), member_key, path, member_size, member))
+        return sources
+
+    async def parse(self, sources: List[ExportSource], status_message) -> List[ChatDataset]:
+        # Parsing runs in worker processes so the event loop and gateway heartbeat stay responsive,
+        # workers open the downloaded files themselves instead of being sent their bytes
+        total_bytes = sum(source.size for source in sources)
+        channel = await self.pool.progress_channel()
+        reporter = asyncio.create_task(self.report_progress(status_message, channel, total_bytes))
+        try:
+            source = sources[0]
+            if len(sources) == 1 and source.member is None and source.size >= PARALLEL_MIN_BYTES and self.pool.processes > 1:
+                chunks = [
+                    (source.path, True, ProgressReporter(channel, key), start, end)
+                    for key, (start, end) in enumerate(await asyncio.to_thread(split_export_file, source.path, self.pool.processes))
+                ]
+                return [merge_datasets(await self.pool.run_chunks(analyze_export_file, chunks))]
+            # Several exports are parsed side by side, one per worker process
+            return await self.pool.run_chunks(analyze_export_file, [
+                (source.path, True, ProgressReporter(channel, key), 0, None, source.member) for key, source in enumerate(sources)
+            ])
+        finally:
+            reporter.cancel()
         
-    @app_commands.command(name="analyze_chat", description="Analyze chat history from an HTML file")
+    @app_commands.command(name="analyze_chat", description="Analyze chat history from HTML files or zip archives of them")
     @app_commands.describe(
-        file="The HTML file containing chat history",
+        file="The HTML file containing chat history, or a zip of several",
         start_date="Start date for analysis (DD-MM-YYYY)",
-        end_date="End date for analysis (DD-MM-YYYY)"
+        end_date="End date for analysis (DD-MM-YYYY)",
+        file2="Another export to include",
+        file3="Another export to include",
+        file4="Another export to include",
+        file5="Another export to include",
+        per_channel="Break the totals down by export file",
+        source="Merge into the stored history with this name, counting only messages it has not seen",
+        reset_source="Start the stored history over before merging",
+        import_counts="Also add the messages to this server's counters, each message only ever once (administrators only)",
+        channel="Channel to count imported messages in, by default the one in each export's file name"
     )
-    async def analyze_chat(self, interaction: discord.Interaction, file: discord.Attachment, start_date: str = None, end_date: str = None):
+    async def analyze_chat(self, interaction: discord.Interaction, file: discord.Attachment, start_date: str = None, end_date: str = None,
+                           file2: discord.Attachment = None, file3: discord.Attachment = None, file4: discord.Attachment = None,
+                           file5: discord.Attachment = None, per_channel: bool = False, source: str = None, reset_source: bool = False,
+                           import_counts: bool = False, channel: discord.TextChannel = None):
         await interaction.response.defer(thinking=True)
 
-        if not file.filename.endswith('.html'):
-            await interaction.followup.send("Please upload an HTML file.")
+        attachments = [attachment for attachment in (file, file2, file3, file4, file5) if attachment is not None]
+        if not all(attachment.filename.lower().endswith(('.html', '.zip')) for attachment in attachments):
+            await interaction.followup.send("Please upload HTML files or zip archives of them.")
             return
 
-        try:
-            content = await file.read()
+        if import_counts and (interaction.guild is None or not interaction.user.guild_permissions.administrator):
+            await interaction.followup.send("Only server administrators can import exports into the counters.")
+            return
 
+        try:
             start_date_obj = datetime.strptime(start_date, "%d-%m-%Y") if start_date else None
             end_date_obj = datetime.strptime(end_date, "%d-%m-%Y") if end_date else None
+        except ValueError as ve:
+            await interaction.followup.send(f"Invalid date format: {str(ve)}")
+            return
+
+        paths = []
+        try:
+            if sum(attachment.size for attachment in attachments) > self.max_bytes:
+                await interaction.followup.send(f"Those files are too large, the limit is {self.max_bytes // (1024 * 1024)} MB.")
+                return
+
+            sources = await self.download_sources(attachments, paths)
+            if not sources:
+                await interaction.followup.send("There are no HTML exports in that archive.")
+                return
+            if sum(export.size for export in sources) > self.max_unzipped_bytes:
+                await interaction.followup.send(f"Those exports are too large once unzipped, the limit is {self.max_unzipped_bytes // (1024 * 1024)} MB.")
+                return
+
+            # Repeated runs over the same exports only filter the datasets the first run stored
+            datasets = [await asyncio.to_thread(self.cache.get, export.key) for export in sources]
+            missing = [index for index, dataset in enumerate(datasets) if dataset is None]
+            if not missing:
+                status_message = await interaction.followup.send("Processing chat history...")
+            else:
+                if self.pool.full:
+                    await interaction.followup.send("Too many chat analyses are queued right now, please try again later.")
+                    return
+
+                # Send initial status message
+                if self.pool.busy:
+                    status_message = await interaction.followup.send(f"Waiting for a free worker, {self.pool.waiting} analyses ahead of this one...")
+                else:
+                    status_message = await interaction.followup.send("Processing chat history...")
+
+                parsed = await self.parse([sources[index] for index in missing], status_message)
+                for index, dataset in zip(missing, parsed):
+                    datasets[index] = dataset
+                    try:
+                        await asyncio.to_thread(self.cache.put, sources[index].key, dataset)
+                    except OSError as e:
+                        print(f"Could not cache chat dataset: {e}")
 
-            progress_updates, result, user_ids = process_chat_history(content, start_date_obj, end_date_obj)
-
-            # Send initial status message
-            status_message = await interaction.followup.send("Processing chat history...")
-
-            # Update status message with progress
-            for update in progress_updates:
-                await status_message.edit(content=update)
-
-            # Create an embed with the analysis results
-            embed = discord.Embed(title="Chat Analysis Results", color=discord.Color.from_str('#af2202'))
-
-            # Split the result into sections
-            sections = result.split('\n\n')
-
-            # Add fields to the embed
-            user_stats = []
-            for section in sections:
-                if section.startswith("Total Messages"):
-                    embed.add_field(name="Overview", value=section, inline=False)
-                elif section.startswith("<@"):
-                    lines = section.split('\n')
-                    if "words" in lines[0]:
-                        embed.add_field(name="Top 10 Users by Word Count:", value='\n'.join(lines), inline=False)
-                    elif "messages" in lines[0]:
-                        embed.add_field(name="Top 10 Users by Messages Sent:", value='\n'.join(lines), inline=False)
-                    elif "attachments" in lines[0]:
-                        embed.add_field(name="Top 10 Users by Attachments Sent:", value='\n'.join(lines), inline=False)
-                elif section.startswith("User:"):
-                    user_stats.append(section)
+            added = 0
+            if source:
+                # The lock keeps two runs on the same source from both merging into the copy they loaded
+                async with self.source_locks[(interaction.guild_id or 0, source.lower())]:
+                    history, added = await asyncio.to_thread(self.merge_into_source, interaction.guild_id or 0, source, datasets, reset_source)
+            else:
+                history = merge_datasets(datasets) if len(datasets) > 1 else datasets[0]
+
+            def summarize() -> ChatAnalysis:
+                analysis = build_analysis(history, start_date_obj, end_date_obj)
+                if per_channel:
+                    analysis.channels = [channel_stats(export.name, dataset, start_date_obj, end_date_obj) for export, dataset in zip(sources, datasets)]
+                return analysis
+            analysis = await asyncio.to_thread(summarize)
+
+            if analysis.messages == 0:
+                await status_message.edit(content="Error: No messages found in the chat log.")
+                return
+
+            notes = []
+            if source:
+                notes.append(f"Added {added:,} new messages to {source}.")
+            if import_counts:
+                imported, unmapped = await self.import_exports(interaction.guild_id, sources, datasets, channel, start_date_obj, end_date_obj)
+                notes.append(f"Imported {imported:,} new messages into the counters.")
+                if unmapped:
+                    notes.append(f"Not imported, no counted channel found for: {', '.join(unmapped)}")
+            summary = "\n".join(notes) or None
 
             try:
                 # Try to send the full embed with user stats
-                for stats in user_stats:
-                    user_id = stats.split('\n')[0].replace("User: <@", "").replace(">", "")
-                    embed.add_field(name=f"Stats for <@{user_id}>", value='\n'.join(stats.split('\n')[1:]), inline=False)
-
-                await interaction.followup.send(embed=embed)
+                await status_message.edit(content=summary, embed=analysis_embed(analysis, user_stats=True))
             except HTTPException as he:
-                # If the embed is too large, remove user stats and create a separate file
-                embed.clear_fields()
-                for section in sections:
-                    if section.startswith("Total Messages"):
-                        embed.add_field(name="Overview", value=section, inline=False)
-                    elif section.startswith("<@"):
-                        lines = section.split('\n')
-                        if "words" in lines[0]:
-                            embed.add_field(name="Top 10 Users by Word Count:", value='\n'.join(lines), inline=False)
-                        elif "messages" in lines[0]:
-                            embed.add_field(name="Top 10 Users by Messages Sent:", value='\n'.join(lines), inline=False)
-                        elif "attachments" in lines[0]:
-                            embed.add_field(name="Top 10 Users by Attachments Sent:", value='\n'.join(lines), inline=False)
-
-                # Create a file with user stats, including usernames
-                user_stats_content = []
-                for stats in user_stats:
-                    user_id = stats.split('\n')[0].replace("User: <@", "").replace(">", "")
-                    user_name = user_ids.get(user_id, "Unknown")
-                    stats_lines = stats.split('\n')
-                    stats_lines.insert(1, f"Username: {user_name}")
-                    user_stats_content.append('\n'.join(stats_lines))
-
-                user_stats_file = discord.File(io.StringIO('\n\n'.join(user_stats_content)), filename="user_stats.txt")
-
-                await interaction.followup.send("The analysis results are too long to display in a single message. Please see the attached file for user stats.", embed=embed, file=user_stats_file)
+                # If the embed is too large, send the user stats as a file instead
+                user_stats_file = discord.File(io.StringIO(user_stats_text(analysis)), filename="user_stats.txt")
+                await status_message.edit(content="\n".join(filter(None, (summary, "The analysis results are too long to display in a single message. Please see the attached file for user stats."))), embed=analysis_embed(analysis), attachments=[user_stats_file])
 
-        except ValueError as ve:
-            await interaction.followup.send(f"Invalid date format: {str(ve)}")
+        except PoolFull:
+            await interaction.followup.send("Too many chat analyses are queued right now, please try again later.")
+        except DownloadTooLarge:
+            await interaction.followup.send(f"Those files are too large, the limit is {self.max_bytes // (1024 * 1024)} MB.")
+        except zipfile.BadZipFile:
+            await interaction.followup.send("That zip archive could not be read.")
         except HTTPException as he:
             await interaction.followup.send(f"An error occurred while sending the message: {str(he)}")
         except Exception as e:
             await interaction.followup.send(f"An error occurred: {str(e)}")
+        finally:
+            for path in paths:
+                os.remove(path)
+
+    async def report_progress(self, status_message, channel, total_bytes) -> None:
+        # Coalesce worker updates into at most one edit per interval, whatever the export size
+        chunks = {}
+        while True:
+            await asyncio.sleep(PROGRESS_EDIT_INTERVAL)
+            updates = await latest_progress(channel)
+            if not updates:
+                continue
+            chunks.update(updates)
+            messages = sum(update[0] for update in chunks.values())
+            bytes_read = sum(update[1] for update in chunks.values())
+            percent = min(bytes_read * 100 // total_bytes, 100) if total_bytes else 0
+            try:
+                await status_message.edit(content=f"Processing chat history... {percent}% ({messages:,} messages)")
+            except HTTPException:
+                pass
 
 async def setup(bot):
     await bot.add_cog(AnalyzeChat(bot))
\ No newline at end of file
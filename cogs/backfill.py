@@ -0,0 +1,91 @@
+import asyncio
+import discord
+from discord.ext import commands
+from discord import app_commands
+from datetime import datetime
+from typing import Dict, Optional
+from cogs.utils.backfill import BackfillJob, backfill_channels, create_checkpoints, reset_checkpoints
+
+class Backfill(commands.Cog):
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self.jobs: Dict[int, BackfillJob] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+        print('Backfill cog loaded')
+
+    async def cog_load(self) -> None:
+        await create_checkpoints(self.bot.db)
+
+    async def cog_unload(self) -> None:
+        # Checkpoints are only written after a batch is flushed, a cancelled job resumes cleanly
+        for task in self.tasks.values():
+            task.cancel()
+
+    backfill = app_commands.Group(name='backfill', description='Count the messages sent before counting was enabled', default_permissions=discord.Permissions(administrator=True))
+
+    @backfill.command(name='start', description='Count the existing history of every counted channel, resuming where it stopped')
+    @app_commands.describe(
+        restart='Forget the saved progress and crawl every channel from the beginning',
+        counted_since='When counting was enabled (DD-MM-YYYY), for channels counted before the bot recorded it',
+    )
+    async def backfill_start(self, interaction: discord.Interaction, restart: bool = False, counted_since: Optional[str] = None) -> None:
+        task = self.tasks.get(interaction.guild_id)
+        if task is not None and not task.done():
+            embed = discord.Embed(title='Error', description='A backfill is already running for this server.', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        try:
+            since = datetime.strptime(counted_since, '%d-%m-%Y') if counted_since else None
+        except ValueError:
+            embed = discord.Embed(title='Error', description='Invalid date format. Please use DD-MM-YYYY.', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        channels = backfill_channels(interaction.guild, self.bot.config.get(interaction.guild_id))
+        if not channels:
+            embed = discord.Embed(title='Error', description='Word count is not being recorded for this server!', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        if restart:
+            await reset_checkpoints(self.bot.db, interaction.guild_id)
+        job = BackfillJob(self.bot, interaction.guild_id, channels, counted_since=since)
+        self.jobs[interaction.guild_id] = job
+        self.tasks[interaction.guild_id] = asyncio.create_task(job.run())
+        embed = discord.Embed(title='Backfill Started', description=f'Counting the history of {len(channels)} channels. Use `/backfill status` to follow it.', color=discord.Color.green())
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @backfill.command(name='status', description='Shows the progress of the backfill')
+    async def backfill_status(self, interaction: discord.Interaction) -> None:
+        job = self.jobs.get(interaction.guild_id)
+        if job is None:
+            embed = discord.Embed(title='Error', description='No backfill has been run since the bot started.', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        stats = job.stats()
+        running = not stats['finished']
+        embed = discord.Embed(title='Backfill Running' if running else 'Backfill Finished', color=discord.Color.from_str('#af2202'))
+        embed.add_field(name='Channels', value=f'{stats["finished_channels"]}/{stats["channels"]} done, {stats["failed_channels"]} failed', inline=False)
+        if stats['unknown_start_channels']:
+            embed.add_field(
+                name='Channels left alone', inline=False,
+                value=f'{stats["unknown_start_channels"]} were counted before the bot recorded when counting started, run `/backfill start` with `counted_since` to crawl them',
+            )
+        embed.add_field(name='Messages counted', value=f'{stats["counted"]:,}', inline=False)
+        embed.add_field(name='Messages skipped', value=f'{stats["skipped"]:,}', inline=False)
+        embed.add_field(name='Elapsed', value=f'{stats["elapsed"]:.0f}s', inline=False)
+        if stats['error']:
+            embed.add_field(name='Last error', value=stats['error'], inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @backfill.command(name='cancel', description='Stops the running backfill, it can be resumed later')
+    async def backfill_cancel(self, interaction: discord.Interaction) -> None:
+        task = self.tasks.get(interaction.guild_id)
+        if task is None or task.done():
+            embed = discord.Embed(title='Error', description='No backfill is running for this server.', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        task.cancel()
+        embed = discord.Embed(title='Success', description='The backfill has been stopped. Run `/backfill start` to resume it.', color=discord.Color.green())
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot) -> None:
+    await bot.add_cog(Backfill(bot))
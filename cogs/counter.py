@@ -1,14 +1,28 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiosqlite
-from cogs.keyword import Keyword
-from cogs.attachments import Attachments
-from cogs.messages import Messages
+from typing import Optional
+import contextlib
+import os
+from cogs.utils.ingest import Event, IngestQueue
+from cogs.utils.ledger import LEDGER_DB, LedgerEntry
+from cogs.utils.message_analysis import MessageAnalysis
+from cogs.utils.metrics import create_metrics, migrate_legacy
+from cogs.utils.write_buffer import TABLES, upsert_deltas
+
+# The order a purge takes the writers of its files in, the ledger's comes last
+PURGE_TABLES = ('metrics', 'keyword_channel', 'keyword_user')
 
 class Counter(commands.Cog):
     def __init__(self, bot) -> None:
         self.bot = bot
+        self.ingest = IngestQueue(
+            self.process_event,
+            workers=int(os.getenv('INGEST_WORKERS', 4)),
+            size=int(os.getenv('INGEST_QUEUE_SIZE', 1000)),
+            policy=os.getenv('INGEST_POLICY', 'block'),
+            max_spill=int(os.getenv('INGEST_MAX_SPILL', 10000)),
+        )
         self.ctx_menu = app_commands.ContextMenu(name='Message Word Count', callback=self.message_word_count)
         self.ctx_menu2 = app_commands.ContextMenu(name='User Stats', callback=self.user_stats)
         print('Counter cog loaded')
@@ -18,15 +32,14 @@ class Counter(commands.Cog):
     async def cog_unload(self) -> None:
         self.bot.tree.remove_command(self.ctx_menu.name, type=self.ctx_menu.type)
         self.bot.tree.remove_command(self.ctx_menu2.name, type=self.ctx_menu2.type)
+        await self.ingest.close()
+        await self.bot.write_buffer.flush()
 
     async def message_word_count(self, interaction: discord.Interaction, message: discord.Message) -> None:
-        async with aiosqlite.connect('channels.db') as db:
-            cursor = await db.execute('SELECT * FROM channels WHERE guild_id = ?', (interaction.guild_id,))
-            result = await cursor.fetchone()
-            if not result:
-                embed = discord.Embed(title='Error', description='Word count is not being recorded for this server!', color=discord.Color.red())
-                await interaction.response.send_message(embed=embed)
-                return
+        if not self.bot.config.get(interaction.guild_id).channels:
+            embed = discord.Embed(title='Error', description='Word count is not being recorded for this server!', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed)
+            return
         if message.author.bot:
             embed = discord.Embed(title='Error', description='Bots cannot have word counts!', color=discord.Color.red())
             await interaction.response.send_message(embed=embed)
@@ -36,283 +49,193 @@ class Counter(commands.Cog):
         await interaction.response.send_message(embed=embed)
 
     async def user_stats(self, interaction: discord.Interaction, user: discord.Member) -> None:
-        async with aiosqlite.connect('channels.db') as db:
-            cursor = await db.execute('SELECT * FROM channels WHERE guild_id = ?', (interaction.guild_id,))
-            result = await cursor.fetchone()
-            if not result:
-                embed = discord.Embed(title='Error', description='Word count is not being recorded for this server!', color=discord.Color.red())
-                await interaction.response.send_message(embed=embed)
-                return
+        if not self.bot.config.get(interaction.guild_id).channels:
+            embed = discord.Embed(title='Error', description='Word count is not being recorded for this server!', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed)
+            return
         if user.bot:
             embed = discord.Embed(title='Error', description='Bots cannot have word counts!', color=discord.Color.red())
             await interaction.response.send_message(embed=embed)
             return
-        async with aiosqlite.connect('server.db') as db:
-            async with db.execute('SELECT count FROM server WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
-                wresult = await cursor.fetchone()
-                if wresult is None:
-                    await db.execute('INSERT INTO server (user_id, guild_id, count) VALUES (?, ?, ?)', (user.id, interaction.guild_id, 0))
-                    await db.commit()
-        async with aiosqlite.connect('attachments_users.db') as db:
-            async with db.execute('SELECT count FROM attachments_users WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
-                aresult = await cursor.fetchone()
-                if aresult is None:
-                    await db.execute('INSERT INTO attachments_users (user_id, guild_id, count) VALUES (?, ?, ?)', (user.id, interaction.guild_id, 0))
-                    await db.commit()
-        async with aiosqlite.connect('message_user.db') as db:
-            async with db.execute('SELECT messages FROM message_user WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
-                mresult = await cursor.fetchone()
-                if mresult is None:
-                    await db.execute('INSERT INTO message_user (user_id, guild_id, messages) VALUES (?, ?, ?)', (user.id, interaction.guild_id, 0))
-                    await db.commit()
-        async with aiosqlite.connect('keyword_user.db') as db:
-            async with db.execute('SELECT keyword, count FROM keyword_user WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
-                kresult = await cursor.fetchall()
-                if not kresult and not wresult and not aresult and not mresult:
-                    embed = discord.Embed(title='Error', description='This user has not said any words in this server!', color=discord.Color.red())
-                    await interaction.response.send_message(embed=embed, ephemeral=True)
-                    return
-                if wresult:
-                    embed = discord.Embed(title='User Stats', description=f'{user.mention} has said {wresult[0]} words in this server!', color=discord.Color.from_str('#af2202'))
-                if mresult:
-                    embed.add_field(name='Total Message Count', value=f'{mresult[0]}', inline=False)
-                if aresult:
-                    embed.add_field(name='Total Attachment Count', value=f'{aresult[0]}', inline=False)
-                if kresult:
-                    for keyword in kresult:
-                        embed.add_field(name=f'Keyword: {keyword[0]}', value=f'Said {keyword[1]} times.', inline=False)
-                embed.set_thumbnail(url=user.avatar.url)
-                embed.set_footer(text=f'{interaction.guild.name}', icon_url=interaction.guild.icon.url)
-
-                await interaction.response.send_message(embed=embed)
+        embed = await self.user_stats_embed(interaction, user)
+        if embed is None:
+            embed = discord.Embed(title='Error', description='This user has not said any words in this server!', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        await interaction.response.send_message(embed=embed)
 
     stats = app_commands.Group(name='stats', description='User statistics commands')
 
     @stats.command(name='user', description='Show detailed statistics for a user')
     @app_commands.describe(user='The user to show statistics for')
     async def user_stats_slash(self, interaction: discord.Interaction, user: discord.Member) -> None:
-        async with aiosqlite.connect('channels.db') as db:
-            cursor = await db.execute('SELECT * FROM channels WHERE guild_id = ?', (interaction.guild_id,))
-            result = await cursor.fetchone()
-            if not result:
-                embed = discord.Embed(title='Error', description='Word count is not being recorded for this server!', color=discord.Color.red())
-                await interaction.response.send_message(embed=embed)
-                return
+        if not self.bot.config.get(interaction.guild_id).channels:
+            embed = discord.Embed(title='Error', description='Word count is not being recorded for this server!', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed)
+            return
         if user.bot:
             embed = discord.Embed(title='Error', description='Bots cannot have word counts!', color=discord.Color.red())
             await interaction.response.send_message(embed=embed)
             return
-        async with aiosqlite.connect('server.db') as db:
-            async with db.execute('SELECT count FROM server WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
-                wresult = await cursor.fetchone()
-                if wresult is None:
-                    await db.execute('INSERT INTO server (user_id, guild_id, count) VALUES (?, ?, ?)', (user.id, interaction.guild_id, 0))
-                    await db.commit()
-        async with aiosqlite.connect('attachments_users.db') as db:
-            async with db.execute('SELECT count FROM attachments_users WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
-                aresult = await cursor.fetchone()
-                if aresult is None:
-                    await db.execute('INSERT INTO attachments_users (user_id, guild_id, count) VALUES (?, ?, ?)', (user.id, interaction.guild_id, 0))
-                    await db.commit()
-        async with aiosqlite.connect('message_user.db') as db:
-            async with db.execute('SELECT messages FROM message_user WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
-                mresult = await cursor.fetchone()
-                if mresult is None:
-                    await db.execute('INSERT INTO message_user (user_id, guild_id, messages) VALUES (?, ?, ?)', (user.id, interaction.guild_id, 0))
-                    await db.commit()
-        async with aiosqlite.connect('keyword_user.db') as db:
+        embed = await self.user_stats_embed(interaction, user)
+        if embed is None:
+            embed = discord.Embed(title='Error', description='This user has not said any words in this server!', color=discord.Color.red())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        await interaction.response.send_message(embed=embed)
+
+    async def user_stats_embed(self, interaction: discord.Interaction, user: discord.Member) -> Optional[discord.Embed]:
+        async with self.bot.db.reader('metrics.db') as db:
+            async with db.execute('SELECT words, messages, attachments FROM metrics_user WHERE guild_id = ? AND user_id = ?', (interaction.guild_id, user.id)) as cursor:
+                result = await cursor.fetchone()
+        async with self.bot.db.reader('keyword_user.db') as db:
             async with db.execute('SELECT keyword, count FROM keyword_user WHERE user_id = ? and guild_id = ?', (user.id, interaction.guild_id)) as cursor:
                 kresult = await cursor.fetchall()
-                if not kresult and not wresult and not aresult and not mresult:
-                    embed = discord.Embed(title='Error', description='This user has not said any words in this server!', color=discord.Color.red())
-                    await interaction.response.send_message(embed=embed, ephemeral=True)
-                    return
-                if wresult:
-                    embed = discord.Embed(title='User Stats', description=f'{user.mention} has said {wresult[0]} words in this server!', color=discord.Color.from_str('#af2202'))
-                if mresult:
-                    embed.add_field(name='Total Message Count', value=f'{mresult[0]}', inline=False)
-                if aresult:
-                    embed.add_field(name='Total Attachment Count', value=f'{aresult[0]}', inline=False)
-                if kresult:
-                    for keyword in kresult:
-                        embed.add_field(name=f'Keyword: {keyword[0]}', value=f'Said {keyword[1]} times.', inline=False)
-                embed.set_thumbnail(url=user.avatar.url)
-                embed.set_footer(text=f'{interaction.guild.name}', icon_url=interaction.guild.icon.url)
-                await interaction.response.send_message(embed=embed)
+        if not result and not kresult:
+            return None
+        words, messages, attachments = result or (0, 0, 0)
+        embed = discord.Embed(title='User Stats', description=f'{user.mention} has said {words} words in this server!', color=discord.Color.from_str('#af2202'))
+        embed.add_field(name='Total Message Count', value=f'{messages}', inline=False)
+        embed.add_field(name='Total Attachment Count', value=f'{attachments}', inline=False)
+        for keyword in kresult:
+            embed.add_field(name=f'Keyword: {keyword[0]}', value=f'Said {keyword[1]} times.', inline=False)
+        embed.set_thumbnail(url=user.avatar.url)
+        embed.set_footer(text=f'{interaction.guild.name}', icon_url=interaction.guild.icon.url)
+        return embed
 
     async def cog_load(self) -> None:
-        async with aiosqlite.connect('counter.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS counters (
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                channel_id INTEGER NOT NULL,
-                count INTEGER NOT NULL,
-                PRIMARY KEY (guild_id, user_id, channel_id)
-                )'''
-            )
-            await db.commit()
-
-        async with aiosqlite.connect('channels.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS channels (
-                guild_id INTEGER NOT NULL,
-                channel_id INTEGER NOT NULL,
-                PRIMARY KEY (guild_id, channel_id)
-                )'''
-            )
-            await db.commit()
-
-        async with aiosqlite.connect('server.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS server (
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                count INTEGER NOT NULL,
-                PRIMARY KEY (guild_id, user_id)
-                )'''
-            )
-            await db.commit()
-
-        async with aiosqlite.connect('ignore.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS ignore (
-                guild_id INTEGER NOT NULL,
-                channel_id INTEGER NOT NULL,
-                PRIMARY KEY (guild_id, channel_id)
-                )'''
-            )
-            await db.commit()
+        async with self.bot.db.writer('metrics.db') as db:
+            await create_metrics(db)
+            imported = await migrate_legacy(db)
+            if imported:
+                print(f'Imported {imported} rows from the legacy counter databases')
+        self.ingest.start()
 
     @commands.Cog.listener()
     async def on_message(self, message) -> None:
         if message.author.bot:
             return
-        async with aiosqlite.connect('ignore.db') as db:
-            async with db.execute('SELECT channel_id FROM ignore WHERE guild_id = ?', (message.guild.id,)) as cursor:
-                iresult = await cursor.fetchall()
-                for row in iresult:
-                    if message.channel.id in row:
-                        return
-        async with aiosqlite.connect('channels.db') as db:
-            async with db.execute('SELECT channel_id FROM channels WHERE guild_id = ?', (message.guild.id,)) as cursor:
-                result = await cursor.fetchall()
-        if not result:
+        channel_id = self.bot.config.get(message.guild.id).route(message.channel)
+        if channel_id is None:
             return
-        else:
-            await Keyword(self).keyword_message(message, result)
-            await Attachments(self).attachment_message(message, result)
-            for channel_id in result:
-                if message.channel.type != discord.ChannelType.public_thread:
-                    if 1 in channel_id or message.channel.id in channel_id:
-                        word_count = len(message.content.split())
-                        await self.update_count(message.guild, message.author, message.channel.id, word_count)
-                        await Messages(self).add_msg(message.guild.id, message.author.id, message.channel.id)
-                else:
-                    if 1 in channel_id or message.channel.parent_id in channel_id:
-                        word_count = len(message.content.split())
-                        await self.update_count(message.guild, message.author, message.channel.parent_id, word_count)
-                        await Messages(self).add_msg(message.guild.id, message.author.id, message.channel.parent_id)
+        # Keyed by the channel the message was sent in, raw events only carry that one
+        await self.ingest.put((message.guild.id, message.channel.id), Event(
+            'create', message.guild.id, channel_id, message.id, message.author.id, message.content, len(message.attachments)
+        ))
 
     @commands.Cog.listener()
-    async def on_message_delete(self, message) -> None:
-        if message.author.bot:
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        if payload.guild_id is None:
             return
-        async with aiosqlite.connect('ignore.db') as db:
-            async with db.execute('SELECT channel_id FROM ignore WHERE guild_id = ?', (message.guild.id,)) as cursor:
-                iresult = await cursor.fetchall()
-                for row in iresult:
-                    if message.channel.id in row:
-                        return
-        async with aiosqlite.connect('channels.db') as db:
-            async with db.execute('SELECT channel_id FROM channels WHERE guild_id = ?', (message.guild.id,)) as cursor:
-                result = await cursor.fetchall()
-        if not result:
+        await self.ingest.put((payload.guild_id, payload.channel_id), Event('delete', payload.guild_id, payload.channel_id, payload.message_id))
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        if payload.guild_id is None:
             return
-        else:
-            await Keyword(self).keyword_delete(message, result)
-            await Attachments(self).attachment_message_delete(message, result)
-            for channel_id in result:
-                if message.channel.type != discord.ChannelType.public_thread:
-                    if 1 in channel_id or message.channel.id in channel_id:
-                        word_count = len(message.content.split())
-                        await self.remove_count(message.guild, message.author, message.channel.id, word_count)
-                        await Messages(self).del_msg(message.guild.id, message.author.id, message.channel.id)
-                else:
-                    if 1 in channel_id or message.channel.parent_id in channel_id:
-                        word_count = len(message.content.split())
-                        await self.remove_count(message.guild, message.author, message.channel.parent_id, word_count)
-                        await Messages(self).del_msg(message.guild.id, message.author.id, message.channel.parent_id)
+        await self.ingest.put((payload.guild_id, payload.channel_id), Event(
+            'bulk_delete', payload.guild_id, payload.channel_id, 0, message_ids=tuple(payload.message_ids)
+        ))
 
     @commands.Cog.listener()
-    async def on_message_edit(self, before, after) -> None:
-        if before.author.bot:
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        if payload.guild_id is None or 'content' not in payload.data:
             return
-        async with aiosqlite.connect('ignore.db') as db:
-            async with db.execute('SELECT channel_id FROM ignore WHERE guild_id = ?', (before.guild.id,)) as cursor:
-                iresult = await cursor.fetchall()
-                for row in iresult:
-                    if before.channel.id in row:
-                        return
-        async with aiosqlite.connect('channels.db') as db:
-            async with db.execute('SELECT channel_id FROM channels WHERE guild_id = ?', (before.guild.id,)) as cursor:
-                result = await cursor.fetchall()
-        if not result:
+        await self.ingest.put((payload.guild_id, payload.channel_id), Event(
+            'edit', payload.guild_id, payload.channel_id, payload.message_id,
+            content=payload.data['content'], attachments=len(payload.data.get('attachments', ()))
+        ))
+
+    async def process_event(self, event: Event) -> None:
+        keyword = self.bot.get_cog('Keyword')
+        if event.kind == 'create':
+            # A backfill can reach a message the live listener already counted, or the other way round.
+            # Both hand it over under the same channel key, so the first one's ledger entry is visible here.
+            if await self.bot.ledger.get(event.message_id) is not None:
+                return
+            analysis = MessageAnalysis(event.content, event.attachments)
+            counts = analysis.keyword_counts(self.bot.config.get(event.guild_id).matcher)
+            await keyword.keyword_message(event.guild_id, event.channel_id, event.user_id, counts)
+            await self.update_count(event.guild_id, event.user_id, event.channel_id, analysis.word_count, 1, analysis.attachments)
+            self.bot.ledger.record(event.message_id, LedgerEntry(
+                event.guild_id, event.channel_id, event.user_id, analysis.word_count, analysis.attachments, counts
+            ))
             return
-        else:
-            await Keyword(self).keyword_edit(before, after, result)
-            await Attachments(self).attachment_message_edit(before, after, result)
-            for channel_id in result:
-                if before.channel.type != discord.ChannelType.public_thread:
-                    if 1 in channel_id or before.channel.id in channel_id:
-                        old_msg_count = len(before.content.split())
-                        new_msg_count = len(after.content.split())
-                        await self.find_dif(before.guild, before.author, before.channel.id, old_msg_count, new_msg_count)
-                else:
-                    if 1 in channel_id or before.channel.parent_id in channel_id:
-                        old_msg_count = len(before.content.split())
-                        new_msg_count = len(after.content.split())
-                        await self.find_dif(before.guild, before.author, before.channel.parent_id, old_msg_count, new_msg_count)
-
-    async def find_dif(self, guild, user, channel_id, old_msg_count, new_msg_count) -> None:
-        if old_msg_count > new_msg_count:
-            count = old_msg_count - new_msg_count
-            await self.remove_count(guild, user, channel_id, count)
-        elif old_msg_count < new_msg_count:
-            count = new_msg_count - old_msg_count
-            await self.update_count(guild, user, channel_id, count)
-
-    async def update_count(self, guild, user, channel_id, count) -> None:
-        async with aiosqlite.connect('counter.db') as db:
-            async with db.execute('SELECT count FROM counters WHERE guild_id = ? AND user_id = ? AND channel_id = ?', (guild.id, user.id, channel_id)) as cursor:
-                result = await cursor.fetchone()
-            if result is None:
-                await db.execute('INSERT INTO counters (guild_id, user_id, channel_id, count) VALUES (?, ?, ?, ?)', (guild.id, user.id, channel_id, count))
-            else:
-                await db.execute('UPDATE counters SET count = ? WHERE guild_id = ? AND user_id = ? AND channel_id = ?', (result[0] + count, guild.id, user.id, channel_id))
-            await db.commit()
-        async with aiosqlite.connect('server.db') as db:
-            async with db.execute('SELECT count FROM server WHERE guild_id = ? AND user_id = ?', (guild.id, user.id)) as cursor:
-                result = await cursor.fetchone()
-            if result is None:
-                await db.execute('INSERT INTO server (guild_id, user_id, count) VALUES (?, ?, ?)', (guild.id, user.id, count))
-            else:
-                await db.execute('UPDATE server SET count = ? WHERE guild_id = ? AND user_id = ?', (result[0] + count, guild.id, user.id))
-            await db.commit()
-
-    async def remove_count(self, guild, user, channel_id, count) -> None:
-        async with aiosqlite.connect('counter.db') as db:
-            async with db.execute('SELECT count FROM counters WHERE guild_id = ? AND user_id = ? AND channel_id = ?', (guild.id, user.id, channel_id)) as cursor:
-                result = await cursor.fetchone()
-            if result is None:
+        # Messages that were never counted have no ledger entry and are left alone
+        if event.kind == 'bulk_delete':
+            await self.bulk_delete(event.message_ids)
+        elif event.kind == 'delete':
+            entry = await self.bot.ledger.pop(event.message_id)
+            if entry is None:
                 return
-            else:
-                await db.execute('UPDATE counters SET count = ? WHERE guild_id = ? AND user_id = ? AND channel_id = ?', (result[0] - count, guild.id, user.id, channel_id))
-            await db.commit()
-        async with aiosqlite.connect('server.db') as db:
-            async with db.execute('SELECT count FROM server WHERE guild_id = ? AND user_id = ?', (guild.id, user.id)) as cursor:
-                result = await cursor.fetchone()
-            if result is None:
+            await keyword.keyword_delete(entry.guild_id, entry.channel_id, entry.user_id, entry.keywords)
+            await self.remove_count(entry.guild_id, entry.user_id, entry.channel_id, entry.words, 1, entry.attachments)
+        elif event.kind == 'edit':
+            entry = await self.bot.ledger.get(event.message_id)
+            if entry is None:
+                return
+            analysis = MessageAnalysis(event.content, event.attachments)
+            counts = analysis.keyword_counts(self.bot.config.get(entry.guild_id).matcher)
+            if analysis.word_count == entry.words and analysis.attachments == entry.attachments and counts == entry.keywords:
                 return
-            else:
-                await db.execute('UPDATE server SET count = ? WHERE guild_id = ? AND user_id = ?', (result[0] - count, guild.id, user.id))
-            await db.commit()
+            await keyword.keyword_edit(entry.guild_id, entry.channel_id, entry.user_id, entry.keywords, counts)
+            await self.find_dif(entry.guild_id, entry.user_id, entry.channel_id, entry, analysis)
+            self.bot.ledger.record(event.message_id, entry._replace(words=analysis.word_count, attachments=analysis.attachments, keywords=counts))
+
+    async def bulk_delete(self, message_ids) -> None:
+        entries = await self.bot.ledger.pop_many(message_ids)
+        if not entries:
+            return
+        # Sum the whole purge up first so each user and keyword gets one decrement
+        pending = {'metrics': {}, 'keyword_channel': {}, 'keyword_user': {}}
+        for entry in entries.values():
+            deltas = pending['metrics'].setdefault((entry.guild_id, entry.user_id, entry.channel_id), [0, 0, 0])
+            deltas[0] -= entry.words
+            deltas[1] -= 1
+            deltas[2] -= entry.attachments
+            for keyword, count in entry.keywords.items():
+                pending['keyword_channel'].setdefault((entry.guild_id, entry.channel_id, keyword, entry.user_id), [0])[0] -= count
+                pending['keyword_user'].setdefault((entry.guild_id, entry.user_id, keyword), [0])[0] -= count
+        # Buffered increments of the purged messages land first, a decrement ahead of them would stop at zero
+        await self.bot.write_buffer.flush()
+        try:
+            await self.apply_purge(pending, list(entries))
+        except BaseException:
+            # What was not committed is left to the next flush rather than lost, the ledger entries are already gone
+            for table, keys in pending.items():
+                for key, deltas in keys.items():
+                    self.bot.write_buffer.add(table, key, *deltas)
+            raise
+
+    async def apply_purge(self, pending, message_ids) -> None:
+        """Applies the decrements of a purge through the writer of each counter file, then drops its ledger entries.
+
+        Every writer is held until the end so no flush lands halfway through, but each file commits
+        on its own. A table leaves ``pending`` once its decrements are committed, so after a failure
+        ``pending`` holds exactly what was not applied.
+        """
+        async with contextlib.AsyncExitStack() as stack:
+            writers = [(table, await stack.enter_async_context(self.bot.db.writer(TABLES[table][0]))) for table in PURGE_TABLES]
+            ledger = await stack.enter_async_context(self.bot.db.writer(LEDGER_DB))
+            for table, db in writers:
+                await upsert_deltas(db, table, pending[table])
+                await db.commit()
+                del pending[table]
+            # The ledger still deletes these on its next flush, finding nothing left
+            await ledger.executemany('DELETE FROM ledger WHERE message_id = ?', [(message_id,) for message_id in message_ids])
+            await ledger.commit()
+
+    async def find_dif(self, guild_id, user_id, channel_id, entry, after) -> None:
+        word_dif = after.word_count - entry.words
+        attachment_dif = after.attachments - entry.attachments
+        if word_dif or attachment_dif:
+            await self.update_count(guild_id, user_id, channel_id, word_dif, 0, attachment_dif)
+
+    async def update_count(self, guild_id, user_id, channel_id, words, messages=0, attachments=0) -> None:
+        self.bot.write_buffer.add('metrics', (guild_id, user_id, channel_id), words, messages, attachments)
+
+    async def remove_count(self, guild_id, user_id, channel_id, words, messages=0, attachments=0) -> None:
+        self.bot.write_buffer.add('metrics', (guild_id, user_id, channel_id), -words, -messages, -attachments)
 
 async def setup(bot) -> None:
     await bot.add_cog(Counter(bot))
\ No newline at end of file
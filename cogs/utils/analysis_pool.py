@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Iterable, List, Optional
+
+class PoolFull(Exception):
+    pass
+
+class ProgressReporter:
+    """Picklable progress callback for a worker process, forwarding at most one update per ``interval``.
+
+    Updates are tagged with ``key`` so the chunks of one job can share a channel.
+    """
+
+    def __init__(self, channel, key: int = 0, interval: float = 0.5) -> None:
+        self.channel = channel
+        self.key = key
+        self.interval = interval
+        self._last = 0.0
+
+    def __getstate__(self) -> dict:
+        return {'channel': self.channel, 'key': self.key, 'interval': self.interval}
+
+    def __setstate__(self, state: dict) -> None:
+        self.channel = state['channel']
+        self.key = state['key']
+        self.interval = state['interval']
+        self._last = 0.0
+
+    def __call__(self, *update) -> None:
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.channel.put((self.key, *update))
+
+async def latest_progress(channel) -> dict:
+    """The newest update waiting on a progress channel for each key"""
+    def drain():
+        updates = {}
+        try:
+            while True:
+                key, *update = channel.get_nowait()
+                updates[key] = tuple(update)
+        except queue.Empty:
+            return updates
+    # Manager queues are proxies, every call is a round trip to the manager process
+    return await asyncio.to_thread(drain)
+
+# Workers are started by a clean server process rather than forked from the bot, whose
+# database and to_thread threads may hold locks a forked child would inherit held forever
+MP_CONTEXT = 'forkserver'
+
+class AnalysisPool:
+    """Runs CPU heavy jobs in worker processes, at most ``workers`` at once with up to ``max_queued`` waiting.
+
+    A job can be split into chunks with run_chunks(), those share the ``processes`` of the pool.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 10, processes: Optional[int] = None) -> None:
+        self.workers = workers
+        self.max_queued = max_queued
+        self.processes = processes or os.cpu_count() or 1
+        self.running = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(workers)
+        self._context = multiprocessing.get_context(MP_CONTEXT)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._manager_lock = asyncio.Lock()
+
+    @property
+    def full(self) -> bool:
+        return self.waiting >= self.max_queued
+
+    @property
+    def busy(self) -> bool:
+        """Whether a new job would have to wait for a free worker"""
+        return self.running >= self.workers
+
+    async def progress_channel(self):
+        """A queue worker processes can put progress updates on"""
+        async with self._manager_lock:
+            if self._manager is None:
+                # Starting the manager process blocks until it answers
+                self._manager = await asyncio.to_thread(self._context.Manager)
+        return await asyncio.to_thread(self._manager.Queue)
+
+    @asynccontextmanager
+    async def _slot(self):
+        if self.full:
+            raise PoolFull(f'{self.waiting} jobs are already waiting')
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=self._context)
+            yield self._executor
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def run_chunks(self, func: Callable, chunks: Iterable[tuple]) -> List:
+        """Runs func(*args) for every args tuple in parallel as one job, results in the same order"""
+        loop = asyncio.get_running_loop()
+        async with self._slot() as executor:
+            return await asyncio.gather(*(loop.run_in_executor(executor, func, *args) for args in chunks))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
@@ -0,0 +1,216 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterable, List, Optional
+import discord
+from cogs.utils.chat_import import imported_ids
+from cogs.utils.guild_config import ALL_CHANNELS
+from cogs.utils.ingest import Event
+
+BACKFILL_DB = 'backfill.db'
+METRICS_DB = 'metrics.db'
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        last_message_id INTEGER NOT NULL,
+        counted INTEGER NOT NULL DEFAULT 0,
+        done INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, channel_id)
+        )''',
+    # First time counting was enabled for a channel, or for the whole server under ALL_CHANNELS,
+    # as a snowflake. Everything sent after it was counted live, a backfill stops there.
+    '''CREATE TABLE IF NOT EXISTS counting_started (
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, channel_id)
+        )''',
+)
+
+# (channel, id of the last message already crawled or None, id to stop before) -> messages in between, oldest first
+HistorySource = Callable[[object, Optional[int], int], AsyncIterator]
+
+def discord_history(channel, after: Optional[int], before: int) -> AsyncIterator:
+    # discord.py pages through history 100 messages at a time and waits out rate limits itself
+    return channel.history(limit=None, after=discord.Object(id=after) if after else None, before=discord.Object(id=before), oldest_first=True)
+
+async def create_checkpoints(db) -> None:
+    async with db.writer(BACKFILL_DB) as conn:
+        for statement in SCHEMA:
+            await conn.execute(statement)
+        await conn.commit()
+
+async def record_counting_started(db, guild_id: int, channel_id: int) -> None:
+    """Remembers that counting starts now for a channel, or ALL_CHANNELS, unless it started earlier"""
+    async with db.writer(BACKFILL_DB) as conn:
+        await conn.execute(
+            'INSERT OR IGNORE INTO counting_started (guild_id, channel_id, message_id) VALUES (?, ?, ?)',
+            (guild_id, channel_id, discord.utils.time_snowflake(discord.utils.utcnow())),
+        )
+        await conn.commit()
+
+async def counting_started(db, guild_id: int, channel_id: int) -> Optional[int]:
+    """Id of the first message counted live in a channel, None if no start was recorded for it"""
+    async with db.reader(BACKFILL_DB) as conn:
+        async with conn.execute(
+            'SELECT MIN(message_id) FROM counting_started WHERE guild_id = ? AND channel_id IN (?, ?)', (guild_id, channel_id, ALL_CHANNELS)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+async def reset_checkpoints(db, guild_id: int) -> None:
+    async with db.writer(BACKFILL_DB) as conn:
+        await conn.execute('DELETE FROM backfill_checkpoints WHERE guild_id = ?', (guild_id,))
+        await conn.commit()
+
+def backfill_channels(guild, config) -> List:
+    """Every text channel and active thread of a guild that messages are counted in"""
+    return [channel for channel in (*guild.text_channels, *guild.threads) if config.route(channel) is not None]
+
+class BackfillJob:
+    """Counts the history of a guild's channels from before counting was enabled, resuming from the last checkpoint of each.
+
+    A channel stops at the time counting started for it. Channels that have counts from before
+    that time was recorded are left alone, unless ``counted_since`` says when counting started.
+    """
+
+    def __init__(self, bot, guild_id: int, channels: Iterable, *, history: HistorySource = discord_history, counted_since: Optional[datetime] = None,
+                 concurrency: int = 3, batch_size: int = 500) -> None:
+        self.bot = bot
+        self.guild_id = guild_id
+        self.channels = list(channels)
+        self.history = history
+        self.counted_since = counted_since
+        self.batch_size = batch_size
+        self.counted = 0
+        self.skipped = 0
+        self.finished_channels = 0
+        self.failed_channels = 0
+        self.unknown_start_channels = 0
+        self.started = time.monotonic()
+        self.error: Optional[str] = None
+        self.finished = False
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def stats(self) -> dict:
+        return {
+            'channels': len(self.channels),
+            'finished_channels': self.finished_channels,
+            'failed_channels': self.failed_channels,
+            'unknown_start_channels': self.unknown_start_channels,
+            'counted': self.counted,
+            'skipped': self.skipped,
+            'elapsed': time.monotonic() - self.started,
+            'error': self.error,
+            'finished': self.finished,
+        }
+
+    async def run(self) -> None:
+        try:
+            if self.bot.get_cog('Counter') is None:
+                self.error = 'The Counter cog is not loaded'
+                return
+            # Channels that never had counts and no recorded start are crawled up to now
+            self._now = discord.utils.time_snowflake(discord.utils.utcnow())
+            await asyncio.gather(*(self._crawl(channel) for channel in self.channels))
+        finally:
+            # Also when cancelled, the status stops showing it as running
+            self.finished = True
+
+    async def _boundary(self, channel) -> Optional[int]:
+        """Id of the first message counted live in a channel, None if that cannot be told"""
+        channel_id = self.bot.config.get(self.guild_id).route(channel)
+        started = await counting_started(self.bot.db, self.guild_id, channel_id)
+        if started is not None:
+            return started
+        if self.counted_since is not None:
+            return discord.utils.time_snowflake(self.counted_since.replace(tzinfo=timezone.utc))
+        # Counting was enabled before starts were recorded, any count it has may come from its history
+        async with self.bot.db.reader(METRICS_DB) as db:
+            async with db.execute('SELECT 1 FROM metrics WHERE guild_id = ? AND channel_id = ? LIMIT 1', (self.guild_id, channel_id)) as cursor:
+                counted = await cursor.fetchone()
+        return None if counted else self._now
+
+    async def _checkpoint(self, channel_id: int):
+        async with self.bot.db.reader(BACKFILL_DB) as db:
+            async with db.execute(
+                'SELECT last_message_id, done FROM backfill_checkpoints WHERE guild_id = ? AND channel_id = ?', (self.guild_id, channel_id)
+            ) as cursor:
+                return await cursor.fetchone()
+
+    async def _crawl(self, channel) -> None:
+        async with self._semaphore:
+            try:
+                await self._crawl_channel(channel)
+            except discord.HTTPException as e:
+                # Usually a channel the bot cannot read, the others carry on
+                self.failed_channels += 1
+                self.error = f'{getattr(channel, "name", channel.id)}: {e}'
+            except Exception as e:
+                self.failed_channels += 1
+                self.error = f'{getattr(channel, "name", channel.id)}: {type(e).__name__}: {e}'
+                print(f'Error backfilling channel {channel.id}: {e}')
+
+    async def _crawl_channel(self, channel) -> None:
+        checkpoint = await self._checkpoint(channel.id)
+        if checkpoint and checkpoint[1]:
+            self.finished_channels += 1
+            return
+        before = await self._boundary(channel)
+        if before is None:
+            self.unknown_start_channels += 1
+            return
+        after = checkpoint[0] if checkpoint else None
+        batch = []
+        async for message in self.history(channel, after, before):
+            batch.append(message)
+            if len(batch) >= self.batch_size:
+                await self._count(channel, batch)
+                batch = []
+        await self._count(channel, batch, done=True)
+        self.finished_channels += 1
+
+    async def _count(self, channel, batch: list, *, done: bool = False) -> None:
+        counter = self.bot.get_cog('Counter')
+        if counter is None:
+            raise RuntimeError('The Counter cog was unloaded')
+        config = self.bot.config.get(self.guild_id)
+        # Messages the live listeners already counted are in the ledger, ones imported from an export or
+        # counted by an earlier backfill are in imported, which outlives the ledger's retention window
+        message_ids = [message.id for message in batch]
+        known = await self.bot.ledger.known(message_ids) | await imported_ids(self.bot.db, self.guild_id, message_ids)
+        handled = []
+        counted_ids = []
+        for message in batch:
+            if message.author.bot or message.id in known:
+                self.skipped += 1
+                continue
+            channel_id = config.route(message.channel)
+            if channel_id is None:
+                self.skipped += 1
+                continue
+            # Same key as the live listeners, a message reaching both is handled once after the other
+            handled.append(await counter.ingest.submit((self.guild_id, message.channel.id), Event(
+                'create', self.guild_id, channel_id, message.id, message.author.id, message.content, len(message.attachments)
+            )))
+            counted_ids.append((self.guild_id, message.id))
+        await asyncio.gather(*handled)
+        counted = len(handled)
+        # Counts and ledger entries are durable before the checkpoint moves past them
+        await self.bot.write_buffer.flush()
+        async with self.bot.db.writer(METRICS_DB) as db:
+            await db.executemany('INSERT OR IGNORE INTO imported (guild_id, message_id) VALUES (?, ?)', counted_ids)
+            await db.commit()
+        await self.bot.ledger.flush()
+        async with self.bot.db.writer(BACKFILL_DB) as db:
+            await db.execute(
+                '''INSERT INTO backfill_checkpoints (guild_id, channel_id, last_message_id, counted, done) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (guild_id, channel_id) DO UPDATE SET
+                    last_message_id = MAX(last_message_id, excluded.last_message_id),
+                    counted = counted + excluded.counted,
+                    done = excluded.done''',
+                (self.guild_id, channel.id, batch[-1].id if batch else 0, counted, int(done)),
+            )
+            await db.commit()
+        self.counted += counted
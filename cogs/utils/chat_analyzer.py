@@ -1,128 +1,412 @@
-import io
+import heapq
+import json
+import mmap
+import os
+import zipfile
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
 from lxml import etree
-from collections import defaultdict
 from datetime import datetime
-from itertools import groupby
-
-def analyze_chat_history(content, start_date=None, end_date=None):
-    parser = etree.HTMLParser()
-    tree = etree.parse(io.BytesIO(content), parser)
-
-    stats = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: {"words": 0, "messages": 0, "attachments": 0})))
-    total_messages = 0
-    total_words = 0
-    total_attachments = 0
-    user_total_words = defaultdict(int)
-    user_total_messages = defaultdict(int)
-    user_total_attachments = defaultdict(int)
-    user_ids = {}
-
-    for msg in tree.xpath('//div[contains(@class, "chatlog__message-group")]'):
+from typing import Dict, List, Tuple
+
+MESSAGE_GROUP_CLASS = "chatlog__message-group"
+MESSAGE_CONTAINER_CLASS = "chatlog__message-container"
+# Where a new message group starts in a DiscordChatExporter export, message text is always escaped
+MESSAGE_GROUP_TAG = b'<div class="chatlog__message-group"'
+# Export timestamps are naive, so are the columns
+EPOCH = datetime(1970, 1, 1)
+# First line of a stored dataset, bump when the column layout changes
+DATASET_MAGIC = b'chat-dataset 3\n'
+
+def iter_message_groups(source, stream=True):
+    """Yields the message group elements of an export file object in document order.
+
+    In stream mode the export is read with iterparse and every group is cleared once
+    it has been handled, so memory stays flat no matter how large the export is.
+    """
+    if not stream:
+        tree = etree.parse(source, etree.HTMLParser())
+        yield from tree.xpath(f'//div[contains(@class, "{MESSAGE_GROUP_CLASS}")]')
+        return
+    for _, elem in etree.iterparse(source, events=('end',), tag='div', html=True):
+        if MESSAGE_GROUP_CLASS not in elem.get('class', ''):
+            continue
+        yield elem
+        # Drop the group and everything before it, only the open ancestors remain
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+class ChatDataset:
+    """One row per counted message of an export, in document order, in compact typed columns.
+
+    Every message of an author group is a row of its own, with its own message id.
+
+    A row points at an (user id, name) pair in ``authors`` so renames are kept per message.
+    """
+
+    __slots__ = ('authors', 'id', 'author', 'ts', 'month', 'words', 'attachments', '_author_index')
+
+    COLUMNS = ('id', 'author', 'ts', 'month', 'words', 'attachments')
+
+    def __init__(self) -> None:
+        self.authors: List[Tuple[str, str]] = []
+        self.id = array('Q')           # message id, 0 when the export has none
+        self.author = array('I')
+        self.ts = array('q')           # seconds since the epoch
+        self.month = array('H')        # year * 12 + month - 1
+        self.words = array('I')
+        self.attachments = array('I')
+        self._author_index: Dict[Tuple[str, str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getstate__(self):
+        # Columns pickle as raw bytes, cheap to send back from a worker process
+        return self.authors, self._columns()
+
+    def __setstate__(self, state) -> None:
+        self.authors, columns = state
+        for name, column in zip(self.COLUMNS, columns):
+            setattr(self, name, column)
+        self._author_index = {author: index for index, author in enumerate(self.authors)}
+
+    def _author(self, author: Tuple[str, str]) -> int:
+        index = self._author_index.get(author)
+        if index is None:
+            index = self._author_index[author] = len(self.authors)
+            self.authors.append(author)
+        return index
+
+    def append(self, user_id: str, name: str, date: datetime, words: int, attachments: int, message_id: int = 0) -> None:
+        self.id.append(message_id)
+        self.author.append(self._author((user_id, name)))
+        self.ts.append(epoch_seconds(date))
+        self.month.append(date.year * 12 + date.month - 1)
+        self.words.append(words)
+        self.attachments.append(attachments)
+
+    def write(self, file) -> None:
+        """Writes the dataset to a binary file object, read it back with ChatDataset.read()"""
+        file.write(DATASET_MAGIC)
+        file.write(json.dumps({'authors': self.authors, 'rows': len(self)}).encode() + b'\n')
+        for column in self._columns():
+            column.tofile(file)
+
+    @classmethod
+    def read(cls, file) -> 'ChatDataset':
+        if file.readline() != DATASET_MAGIC:
+            raise ValueError('Not a chat dataset file')
+        header = json.loads(file.readline())
+        dataset = cls()
+        for author in header['authors']:
+            dataset._author(tuple(author))
+        for column in dataset._columns():
+            column.fromfile(file, header['rows'])
+        return dataset
+
+    def _columns(self):
+        return tuple(getattr(self, name) for name in self.COLUMNS)
+
+    def extend(self, other: 'ChatDataset') -> None:
+        """Appends the rows of another dataset after the rows of this one"""
+        remap = [self._author(author) for author in other.authors]
+        self.author.extend(array('I', [remap[index] for index in other.author]))
+        for name in self.COLUMNS:
+            if name != 'author':
+                getattr(self, name).extend(getattr(other, name))
+
+    def merge_new(self, other: 'ChatDataset') -> int:
+        """Adds the rows of ``other`` whose message id this dataset lacks, returns how many were added.
+
+        Rows are kept sorted by message id. Ids above the newest one are new without a lookup,
+        which is every row when exports of a channel come in order; older ids are looked up with
+        a binary search. Rows without a message id cannot be told apart and are left out.
+        """
+        ids = self.id
+        newest = ids[-1] if ids else 0
+        remap = [self._author(author) for author in other.authors]
+        added = 0
+        older = {}
+        for row, message_id in enumerate(other.id):
+            if message_id > newest:
+                self._append_row(other, row, remap)
+                newest = message_id
+                added += 1
+            elif message_id and message_id not in older:
+                index = bisect_left(ids, message_id)
+                if index == len(ids) or ids[index] != message_id:
+                    older[message_id] = row
+        if older:
+            # Messages from before the newest one already seen, put everything back in id order
+            for row in older.values():
+                self._append_row(other, row, remap)
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            for name, column in zip(self.COLUMNS, self._columns()):
+                setattr(self, name, array(column.typecode, [column[index] for index in order]))
+        return added + len(older)
+
+    def _append_row(self, other: 'ChatDataset', row: int, remap: List[int]) -> None:
+        self.id.append(other.id[row])
+        self.author.append(remap[other.author[row]])
+        self.ts.append(other.ts[row])
+        self.month.append(other.month[row])
+        self.words.append(other.words[row])
+        self.attachments.append(other.attachments[row])
+
+def epoch_seconds(date: datetime) -> int:
+    return int((date - EPOCH).total_seconds())
+
+class ByteRange:
+    """Read only file object over ``buffer[start:end]``, copying just the pieces the parser asks for.
+
+    Works over bytes as well as an mmap, so a worker never holds a whole export in memory.
+    """
+
+    def __init__(self, buffer, start=0, end=None):
+        self.buffer = buffer
+        self.start = start
+        self.end = len(buffer) if end is None else end
+        self.pos = start
+
+    def read(self, size=-1):
+        stop = self.end if size is None or size < 0 else min(self.end, self.pos + size)
+        data = self.buffer[self.pos:stop]
+        self.pos = stop
+        return data
+
+    def tell(self):
+        return self.pos - self.start
+
+def analyze_chat_history(content, stream=True, progress=None, start=0, end=None):
+    """Parses the messages of an export, or of the ``start:end`` chunk of one, into a dataset.
+
+    ``content`` is bytes or an mmap. progress(messages, bytes_read, total_bytes) is
+    called every 1000 counted messages.
+    """
+    source = ByteRange(content, start, end)
+    return parse_export(source, source.end - start, stream, progress)
+
+# The two timestamp formats DiscordChatExporter has used over the years
+TIMESTAMP_FORMATS = ('%d/%m/%Y %H:%M', '%d-%m-%Y %H:%M:%S')
+
+def parse_timestamp(timestamp):
+    """The date of an export timestamp, None if it is in no known format"""
+    for timestamp_format in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(timestamp, timestamp_format)
+        except ValueError:
+            pass
+    return None
+
+def parse_export(source, total_bytes, stream=True, progress=None):
+    """analyze_chat_history() of a file object holding ``total_bytes`` of export"""
+    dataset = ChatDataset()
+
+    for msg in iter_message_groups(source, stream):
         try:
             author_elem = msg.xpath('.//span[@class="chatlog__author"]')
             if not author_elem:
                 continue
             author = author_elem[0].get('title', 'Unknown')
             user_id = author_elem[0].get('data-user-id', 'Unknown')
-            
-            timestamp_elem = msg.xpath('.//span[@class="chatlog__timestamp"]/a/text()')
-            if not timestamp_elem:
-                continue
-            timestamp = timestamp_elem[0]
-            
+
             is_bot = bool(msg.xpath('.//span[@class="chatlog__author-tag" and text()="BOT"]'))
-            
+
             if is_bot:
                 continue
 
-            # Handle both timestamp formats
-            try:
-                date = datetime.strptime(timestamp, '%d/%m/%Y %H:%M')
-            except ValueError:
-                try:
-                    date = datetime.strptime(timestamp, '%d-%m-%Y %H:%M:%S')
-                except ValueError:
+            # Consecutive messages of one author share a group, only the first has the header.
+            # Exports without message containers are counted a group at a time.
+            containers = msg.xpath(f'./div[contains(@class, "{MESSAGE_CONTAINER_CLASS}")]') or [msg]
+            date = None
+            for container in containers:
+                # The header timestamp of the first message, the full date in the short timestamp's title of the others
+                timestamp = container.xpath('.//span[@class="chatlog__timestamp"]/a/text() | .//div[@class="chatlog__short-timestamp"]/@title')
+                # A follow-up with an unreadable timestamp is dated like the message before it
+                date = (parse_timestamp(timestamp[0]) if timestamp else None) or date
+                if date is None:
                     continue  # Skip messages with invalid timestamps
 
-            # Skip messages outside the specified date range
-            if start_date and date < start_date:
-                continue
-            if end_date and date > end_date:
-                continue
+                # Extract content from regular messages and embeds, including formatted text
+                content_elements = container.xpath('.//div[contains(@class, "chatlog__content")]/span[@class="chatlog__markdown-preserve"]//text() | .//div[@class="chatlog__embed-description"]//div[@class="chatlog__markdown chatlog__markdown-preserve"]//text()')
+                word_count = len(' '.join(content_elements).split())
 
-            # Extract content from regular messages and embeds, including formatted text
-            content_elements = msg.xpath('.//div[contains(@class, "chatlog__content")]/span[@class="chatlog__markdown-preserve"]//text() | .//div[@class="chatlog__embed-description"]//div[@class="chatlog__markdown chatlog__markdown-preserve"]//text()')
-            content = ' '.join(content_elements)
+                # Count attachments
+                attachment_count = len(container.xpath('.//div[@class="chatlog__attachment"]/a'))
 
-            word_count = len(content.split())
+                message_id = container.xpath('(descendant-or-self::*/@data-message-id)[1]')
 
-            # Count attachments
-            attachment_count = len(msg.xpath('.//div[@class="chatlog__attachment"]/a'))
+                dataset.append(user_id, author, date, word_count, attachment_count, int(message_id[0]) if message_id else 0)
 
-            stats[user_id][date.year][date.month]["words"] += word_count
-            stats[user_id][date.year][date.month]["messages"] += 1
-            stats[user_id][date.year][date.month]["attachments"] += attachment_count
-            user_total_words[user_id] += word_count
-            user_total_messages[user_id] += 1
-            user_total_attachments[user_id] += attachment_count
-            user_ids[user_id] = author
-            total_messages += 1
-            total_words += word_count
-            total_attachments += attachment_count
-
-            if total_messages % 1000 == 0:
-                yield f"Processed {total_messages} messages..."
+                if progress is not None and len(dataset) % 1000 == 0:
+                    # How far the parser has read into the export, for a progress percentage
+                    progress(len(dataset), min(source.tell(), total_bytes), total_bytes)
         except Exception as e:
             print(f"Error processing message: {e}")
 
-    if total_messages == 0:
-        yield "Error: No messages found in the chat log."
-        return
+    return dataset
+
+def analyze_export_file(path, stream=True, progress=None, start=0, end=None, member=None):
+    """analyze_chat_history() over an export file on disk, read through an mmap.
+
+    With ``member`` the file is a zip archive and that export in it is decompressed as it is parsed.
+    """
+    if member is not None:
+        with zipfile.ZipFile(path) as archive, archive.open(member) as source:
+            return parse_export(source, archive.getinfo(member).file_size, stream, progress)
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return ChatDataset()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return analyze_chat_history(content, stream, progress, start, end)
+
+def zip_exports(path):
+    """(name, uncompressed size) of every HTML export in a zip archive"""
+    with zipfile.ZipFile(path) as archive:
+        return [
+            (info.filename, info.file_size) for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.html') and not info.filename.startswith('__MACOSX/')
+        ]
+
+def merge_datasets(datasets):
+    """Joins the datasets of consecutive chunks, in chunk order, as if the export was read in one go"""
+    merged = ChatDataset()
+    for dataset in datasets:
+        merged.extend(dataset)
+    return merged
+
+@dataclass
+class UserStats:
+    user_id: str
+    name: str
+    messages: int
+    words: int
+    attachments: int
+    # (year, month, words, messages, attachments) for every month with a message, oldest first
+    months: List[Tuple[int, int, int, int, int]]
+
+@dataclass
+class ChannelStats:
+    name: str
+    messages: int
+    words: int
+    attachments: int
+
+@dataclass
+class ChatAnalysis:
+    """Totals, top lists and per-user monthly breakdown of an analysed export"""
+    messages: int
+    words: int
+    attachments: int
+    # (user id, count) pairs, highest first
+    top_words: List[Tuple[str, int]]
+    top_messages: List[Tuple[str, int]]
+    top_attachments: List[Tuple[str, int]]
+    # In order of first message
+    users: List[UserStats] = field(default_factory=list)
+    # One per analysed export, when several were merged
+    channels: List[ChannelStats] = field(default_factory=list)
+
+def build_analysis(dataset, start_date=None, end_date=None, top=10):
+    """The structured result of the rows between ``start_date`` and ``end_date``, with ``top`` users in each top list"""
+    start = epoch_seconds(start_date) if start_date else None
+    end = epoch_seconds(end_date) if end_date else None
+    user_index: Dict[str, int] = {}
+    author_user = [user_index.setdefault(user_id, len(user_index)) for user_id, _ in dataset.authors]
+    totals = [[0, 0, 0] for _ in user_index]                  # messages, words, attachments
+    months: List[Dict[int, List[int]]] = [{} for _ in user_index]  # month -> words, messages, attachments
+    last_author = [0] * len(user_index)
+    order = []  # user indexes in order of first message
+
+    for author, ts, month, words, attachments in zip(dataset.author, dataset.ts, dataset.month, dataset.words, dataset.attachments):
+        if start is not None and ts < start:
+            continue
+        if end is not None and ts > end:
+            continue
+        user = author_user[author]
+        total = totals[user]
+        if total[0] == 0:
+            order.append(user)
+        total[0] += 1
+        total[1] += words
+        total[2] += attachments
+        counts = months[user].get(month)
+        if counts is None:
+            counts = months[user][month] = [0, 0, 0]
+        counts[0] += words
+        counts[1] += 1
+        counts[2] += attachments
+        last_author[user] = author
+
+    def top_users(column):
+        # nlargest keeps ties in order of first message, like a stable sort would
+        return [(dataset.authors[last_author[user]][0], totals[user][column]) for user in heapq.nlargest(top, order, key=lambda user: totals[user][column])]
+
+    return ChatAnalysis(
+        messages=sum(totals[user][0] for user in order),
+        words=sum(totals[user][1] for user in order),
+        attachments=sum(totals[user][2] for user in order),
+        top_words=top_users(1),
+        top_messages=top_users(0),
+        top_attachments=top_users(2),
+        users=[
+            UserStats(
+                *dataset.authors[last_author[user]], *totals[user],
+                [(month // 12, month % 12 + 1, *counts) for month, counts in sorted(months[user].items())],
+            )
+            for user in order
+        ],
+    )
+
+def channel_stats(name, dataset, start_date=None, end_date=None):
+    """Totals of the rows of one export between ``start_date`` and ``end_date``"""
+    start = epoch_seconds(start_date) if start_date else None
+    end = epoch_seconds(end_date) if end_date else None
+    messages = words = attachments = 0
+    for ts, row_words, row_attachments in zip(dataset.ts, dataset.words, dataset.attachments):
+        if start is not None and ts < start:
+            continue
+        if end is not None and ts > end:
+            continue
+        messages += 1
+        words += row_words
+        attachments += row_attachments
+    return ChannelStats(name, messages, words, attachments)
+
+def split_export(content, parts):
+    """Byte ranges covering the export (bytes or an mmap), cut right before message groups, at most ``parts`` of them"""
+    bounds = [0]
+    size = len(content)
+    for part in range(1, parts):
+        cut = content.find(MESSAGE_GROUP_TAG, max(bounds[-1] + 1, size * part // parts))
+        if cut == -1:
+            break
+        bounds.append(cut)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+def split_export_file(path, parts):
+    """split_export() of an export file on disk"""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return [(0, 0)]
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return split_export(content, parts)
+
+def process_chat_history(content, start_date=None, end_date=None, stream=True, progress=None):
+    """Runs the analysis to the end, calling progress(messages, bytes_read, total_bytes) along the way.
 
-    result = ["Chat Analysis Results:\n"]
-    result.append(f"Total Messages: {total_messages}")
-    result.append(f"Total Words: {total_words}")
-    result.append(f"Total Attachments: {total_attachments}\n")
-
-    # Remove headers from top 10 lists
-    for user_id, count in sorted(user_total_words.items(), key=lambda x: x[1], reverse=True)[:10]:
-        result.append(f"<@{user_id}>: {count} words")
-    result.append("")
-
-    for user_id, count in sorted(user_total_messages.items(), key=lambda x: x[1], reverse=True)[:10]:
-        result.append(f"<@{user_id}>: {count} messages")
-    result.append("")
-
-    for user_id, count in sorted(user_total_attachments.items(), key=lambda x: x[1], reverse=True)[:10]:
-        result.append(f"<@{user_id}>: {count} attachments")
-    result.append("")
-
-    for user_id, years in stats.items():
-        result.append(f"User: <@{user_id}>")
-        result.append(f"Total Messages: {user_total_messages[user_id]}")
-        result.append(f"Total Words: {user_total_words[user_id]}")
-        result.append(f"Total Attachments: {user_total_attachments[user_id]}")
-        for year, months in sorted(years.items()):
-            result.append(f"Year {year}:")
-            for month, data in sorted(months.items()):
-                result.append(f"  Month {month:02d}: {data['words']} words, {data['messages']} messages, {data['attachments']} attachments")
-        result.append("")
-
-    yield '\n'.join(result)
-    yield user_ids
-
-def process_chat_history(content, start_date=None, end_date=None):
-    analyzer = analyze_chat_history(content, start_date, end_date)
-    progress_updates = []
-    final_result = ""
-    user_ids = {}
-
-    for item in analyzer:
-        if isinstance(item, str) and item.startswith("Processed"):
-            progress_updates.append(item)
-        elif isinstance(item, dict):
-            user_ids = item
-        else:
-            final_result = item
-
-    return progress_updates, final_result, user_ids
+    ``content`` is one export, or a dict of channel name -> export to merge into one report
+    with a per-channel breakdown.
+    """
+    if not isinstance(content, dict):
+        return build_analysis(analyze_chat_history(content, stream, progress), start_date, end_date)
+    datasets = {name: analyze_chat_history(export, stream, progress) for name, export in content.items()}
+    analysis = build_analysis(merge_datasets(datasets.values()), start_date, end_date)
+    analysis.channels = [channel_stats(name, dataset, start_date, end_date) for name, dataset in datasets.items()]
+    return analysis
@@ -0,0 +1,84 @@
+import re
+from typing import Iterable, Optional, Set
+from cogs.utils.chat_analyzer import ChatDataset, epoch_seconds
+from cogs.utils.ledger import LEDGER_DB
+
+METRICS_DB = 'metrics.db'
+
+# DiscordChatExporter puts the channel id in brackets: "Guild - Category - channel [123456789012345678]"
+EXPORT_CHANNEL_ID = re.compile(r'\[(\d{15,21})\]')
+
+STAGING = '''CREATE TEMP TABLE IF NOT EXISTS import_staging (
+    message_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    words INTEGER NOT NULL,
+    attachments INTEGER NOT NULL
+    )'''
+
+def export_channel_id(name: str) -> Optional[int]:
+    """The channel id in an export's file name, None if it has none"""
+    matches = EXPORT_CHANNEL_ID.findall(name)
+    return int(matches[-1]) if matches else None
+
+async def import_dataset(db, guild_id: int, channel_id: int, dataset: ChatDataset, start_date=None, end_date=None, before: Optional[int] = None) -> int:
+    """Adds the messages of an export to the live counters of ``channel_id``, returns how many were new.
+
+    Every row is one Discord message, as the live counters count them. Rows are staged in a temp
+    table and merged with set-based statements in one transaction. The import stops at message id
+    ``before``, where live counting started. Messages imported before or counted live, which have a
+    ledger entry, are skipped; every message added is recorded in ``imported``.
+    """
+    start = epoch_seconds(start_date) if start_date else None
+    end = epoch_seconds(end_date) if end_date else None
+    author_user = [int(user_id) if user_id.isdigit() else None for user_id, _ in dataset.authors]
+    rows = [
+        (message_id, author_user[author], words, attachments)
+        for message_id, author, ts, words, attachments in zip(dataset.id, dataset.author, dataset.ts, dataset.words, dataset.attachments)
+        if message_id and author_user[author] is not None and (before is None or message_id < before)
+        and (start is None or ts >= start) and (end is None or ts <= end)
+    ]
+    if not rows:
+        return 0
+
+    async with db.writer(METRICS_DB) as conn:
+        # Attached outside of any transaction, SQLite refuses to otherwise
+        await conn.execute('ATTACH DATABASE ? AS ledger', (LEDGER_DB,))
+        try:
+            await conn.execute(STAGING)
+            await conn.executemany('INSERT OR IGNORE INTO import_staging VALUES (?, ?, ?, ?)', rows)
+            await conn.execute(
+                '''DELETE FROM import_staging
+                WHERE EXISTS (SELECT 1 FROM imported WHERE guild_id = ? AND message_id = import_staging.message_id)
+                OR EXISTS (SELECT 1 FROM ledger.ledger WHERE message_id = import_staging.message_id)''',
+                (guild_id,),
+            )
+            await conn.execute(
+                '''INSERT INTO metrics (guild_id, user_id, channel_id, words, messages, attachments)
+                SELECT ?, user_id, ?, SUM(words), COUNT(*), SUM(attachments) FROM import_staging WHERE true GROUP BY user_id
+                ON CONFLICT (guild_id, user_id, channel_id) DO UPDATE SET
+                    words = words + excluded.words,
+                    messages = messages + excluded.messages,
+                    attachments = attachments + excluded.attachments''',
+                (guild_id, channel_id),
+            )
+            cursor = await conn.execute('INSERT INTO imported (guild_id, message_id) SELECT ?, message_id FROM import_staging', (guild_id,))
+            added = cursor.rowcount
+            await conn.execute('DELETE FROM import_staging')
+            await conn.commit()
+        except BaseException:
+            await conn.rollback()
+            raise
+        finally:
+            await conn.execute('DETACH DATABASE ledger')
+    return added
+
+async def imported_ids(db, guild_id: int, message_ids: Iterable[int]) -> Set[int]:
+    """The ids in ``message_ids`` that were imported from a chat export or counted by a backfill"""
+    message_ids = list(message_ids)
+    if not message_ids:
+        return set()
+    async with db.reader(METRICS_DB) as conn:
+        async with conn.execute(
+            f'SELECT message_id FROM imported WHERE guild_id = ? AND message_id IN ({", ".join("?" * len(message_ids))})', (guild_id, *message_ids)
+        ) as cursor:
+            return {row[0] async for row in cursor}
@@ -0,0 +1,97 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+import aiosqlite
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+)
+
+class DatabaseManager:
+    """Keeps one writer and a small pool of reader connections open per database file"""
+
+    def __init__(self, readers: int = 2) -> None:
+        self.readers = readers
+        self._writers: Dict[str, aiosqlite.Connection] = {}
+        self._write_locks: Dict[str, asyncio.Lock] = {}
+        self._reader_pools: Dict[str, asyncio.Queue] = {}
+        self._reader_conns: Dict[str, list] = {}
+        self._open_lock = asyncio.Lock()
+
+    async def _connect(self, path: str, *, read_only: bool = False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(path)
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        if read_only:
+            await conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    @asynccontextmanager
+    async def writer(self, path: str) -> AsyncIterator[aiosqlite.Connection]:
+        """Exclusive access to the writer connection of a database file.
+
+        Anything left uncommitted when the block exits cleanly is committed,
+        and rolled back if the block raises.
+        """
+        lock = self._write_locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            conn = await self._writer_conn(path)
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    await conn.rollback()
+                raise
+            if conn.in_transaction:
+                await conn.commit()
+
+    @asynccontextmanager
+    async def reader(self, path: str) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a read-only connection of a database file from its pool"""
+        pool = self._reader_pools.get(path)
+        if pool is None:
+            pool = await self._open_readers(path)
+        conn = await pool.get()
+        try:
+            yield conn
+        finally:
+            pool.put_nowait(conn)
+
+    async def _writer_conn(self, path: str) -> aiosqlite.Connection:
+        conn = self._writers.get(path)
+        if conn is None:
+            async with self._open_lock:
+                conn = self._writers.get(path)
+                if conn is None:
+                    conn = self._writers[path] = await self._connect(path)
+        return conn
+
+    async def _open_readers(self, path: str) -> asyncio.Queue:
+        # The writer switches the file to WAL before any reader attaches to it
+        await self._writer_conn(path)
+        async with self._open_lock:
+            pool = self._reader_pools.get(path)
+            if pool is not None:
+                return pool
+            pool = asyncio.Queue()
+            conns = [await self._connect(path, read_only=True) for _ in range(self.readers)]
+            for conn in conns:
+                pool.put_nowait(conn)
+            self._reader_conns[path] = conns
+            self._reader_pools[path] = pool
+            return pool
+
+    async def close(self) -> None:
+        for path, lock in list(self._write_locks.items()):
+            async with lock:
+                conn = self._writers.pop(path, None)
+                if conn is not None:
+                    await conn.close()
+        for conns in self._reader_conns.values():
+            for conn in conns:
+                await conn.close()
+        self._reader_conns.clear()
+        self._reader_pools.clear()
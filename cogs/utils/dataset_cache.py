@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional
+from cogs.utils.chat_analyzer import ChatDataset
+
+SUFFIX = '.dataset'
+
+class DatasetCache:
+    """Parsed export datasets on disk, keyed by the SHA-256 hex digest of the export, least recently used evicted past ``max_bytes``.
+
+    A file's modification time is its last use. Every method blocks, run them in a thread.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key: str) -> Optional[ChatDataset]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                dataset = ChatDataset.read(file)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, EOFError) as e:
+            print(f'Dropping unreadable cached dataset {key}: {e}')
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dataset
+
+    def put(self, key: str, dataset: ChatDataset) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        write_dataset(self._path(key), dataset)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        _remove(path)
+
+class SourceStore:
+    """Datasets that successive exports of one source, like a channel exported every month, are merged into.
+
+    One file per guild and source name, kept until the source is deleted. Every method blocks, run them in a thread.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _path(self, guild_id: int, name: str) -> str:
+        # Names are typed by users, only their hash goes into the path
+        return os.path.join(self.directory, str(guild_id), hashlib.sha256(name.lower().encode()).hexdigest() + SUFFIX)
+
+    def load(self, guild_id: int, name: str) -> ChatDataset:
+        """The stored dataset of a source, empty for a new one or one that cannot be read"""
+        try:
+            with open(self._path(guild_id, name), 'rb') as file:
+                return ChatDataset.read(file)
+        except FileNotFoundError:
+            return ChatDataset()
+        except (OSError, ValueError, EOFError) as e:
+            # Cut short by a crash or in an older layout. Started over, the next save replaces it,
+            # merging into rows an older layout cannot tell apart would count them twice
+            print(f'Starting the stored history of source {name!r} over, it cannot be read: {e}')
+            return ChatDataset()
+
+    def save(self, guild_id: int, name: str, dataset: ChatDataset) -> None:
+        path = self._path(guild_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_dataset(path, dataset)
+
+    def delete(self, guild_id: int, name: str) -> bool:
+        try:
+            os.remove(self._path(guild_id, name))
+        except FileNotFoundError:
+            return False
+        return True
+
+def write_dataset(path: str, dataset: ChatDataset) -> None:
+    # Written to a temp file of its own next to the final name and renamed, a reader never
+    # sees half a file and two threads writing the same dataset never share one
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with open(fd, 'wb') as file:
+            dataset.write(file)
+            # On disk before the rename, a crash right after it cannot leave an empty file behind
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        _remove(temp_path)
+        raise
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,36 @@
+import hashlib
+import os
+import tempfile
+from typing import Tuple
+import aiohttp
+
+CHUNK_SIZE = 256 * 1024
+
+class DownloadTooLarge(Exception):
+    pass
+
+async def download_to_file(session: aiohttp.ClientSession, url: str, max_bytes: int, *, suffix: str = '') -> Tuple[str, str]:
+    """Streams ``url`` into a temporary file, giving up once it passes ``max_bytes``.
+
+    Returns the path of the file, which the caller removes, and the SHA-256 hex digest of its content.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                if (response.content_length or 0) > max_bytes:
+                    raise DownloadTooLarge(f'{response.content_length} bytes is over the {max_bytes} byte limit')
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    # Checked as it arrives, the advertised length can be missing or wrong
+                    if size > max_bytes:
+                        raise DownloadTooLarge(f'More than the {max_bytes} byte limit')
+                    digest.update(chunk)
+                    file.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional, Set
+import discord
+from cogs.utils.keyword_matcher import KeywordMatcher
+
+SCHEMA = (
+    ('channels.db', '''CREATE TABLE IF NOT EXISTS channels (
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, channel_id)
+        )'''),
+    ('ignore.db', '''CREATE TABLE IF NOT EXISTS ignore (
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, channel_id)
+        )'''),
+    ('keyword.db', '''CREATE TABLE IF NOT EXISTS keyword (
+        guild_id INTEGER NOT NULL,
+        keyword TEXT NOT NULL,
+        PRIMARY KEY (guild_id, keyword)
+        )'''),
+)
+
+# Whole-server sentinel stored in the channels table by /count server set
+ALL_CHANNELS = 1
+
+THREAD_TYPES = (
+    discord.ChannelType.public_thread,
+    discord.ChannelType.private_thread,
+    discord.ChannelType.news_thread,
+)
+
+# Threads seen since the last config change, forgotten once this many pile up
+MAX_THREAD_ROUTES = 10000
+
+class GuildConfig:
+    __slots__ = ('channels', 'ignored', 'keywords', '_routes', '_threads', '_matcher')
+
+    def __init__(self) -> None:
+        self.channels: Set[int] = set()
+        self.ignored: Set[int] = set()
+        self.keywords: List[str] = []
+        self._routes: Optional[Dict[int, Optional[int]]] = None
+        self._threads: Dict[int, Optional[int]] = {}
+        self._matcher: Optional[KeywordMatcher] = None
+
+    def invalidate(self) -> None:
+        self._routes = None
+        self._threads = {}
+        self._matcher = None
+
+    @property
+    def matcher(self) -> KeywordMatcher:
+        matcher = self._matcher
+        if matcher is None:
+            matcher = self._matcher = KeywordMatcher(self.keywords)
+        return matcher
+
+    def _compile(self) -> Dict[int, Optional[int]]:
+        routes = {channel_id: channel_id for channel_id in self.channels if channel_id != ALL_CHANNELS}
+        for channel_id in self.ignored:
+            routes[channel_id] = None
+        self._routes = routes
+        return routes
+
+    def route_id(self, channel_id: int) -> Optional[int]:
+        """The channel a non-thread channel counts towards, None if it is not counted"""
+        routes = self._routes
+        if routes is None:
+            routes = self._compile()
+        if channel_id in routes:
+            return routes[channel_id]
+        return channel_id if ALL_CHANNELS in self.channels else None
+
+    def route(self, channel) -> Optional[int]:
+        """The channel a message sent in ``channel`` counts towards, None if it is not counted.
+
+        Threads, private threads and forum posts count towards their parent channel
+        and follow its ignore setting, unless the thread itself is ignored.
+        """
+        if channel.type not in THREAD_TYPES or channel.parent_id is None:
+            return self.route_id(channel.id)
+        threads = self._threads
+        if channel.id in threads:
+            return threads[channel.id]
+        if self._routes is None:
+            self._compile()
+        if channel.id in self.ignored:
+            target = None
+        else:
+            target = self.route_id(channel.parent_id)
+        if len(threads) >= MAX_THREAD_ROUTES:
+            threads = self._threads = {}
+        threads[channel.id] = target
+        return target
+
+EMPTY = GuildConfig()
+
+class GuildConfigCache:
+    """In-memory copy of the channels, ignore and keyword tables, keyed by guild"""
+
+    def __init__(self, db) -> None:
+        self.db = db
+        self._guilds: Dict[int, GuildConfig] = {}
+
+    async def load(self) -> None:
+        for path, statement in SCHEMA:
+            async with self.db.writer(path) as db:
+                await db.execute(statement)
+                await db.commit()
+        guilds = {}
+        async with self.db.writer('channels.db') as db:
+            await db.execute("ATTACH DATABASE 'ignore.db' AS ignore_db")
+            await db.execute("ATTACH DATABASE 'keyword.db' AS keyword_db")
+            try:
+                async with db.execute('''SELECT 0, guild_id, channel_id FROM channels
+                    UNION ALL SELECT 1, guild_id, channel_id FROM ignore_db.ignore
+                    UNION ALL SELECT 2, guild_id, keyword FROM keyword_db.keyword''') as cursor:
+                    async for kind, guild_id, value in cursor:
+                        config = guilds.get(guild_id)
+                        if config is None:
+                            config = guilds[guild_id] = GuildConfig()
+                        if kind == 0:
+                            config.channels.add(value)
+                        elif kind == 1:
+                            config.ignored.add(value)
+                        else:
+                            config.keywords.append(value)
+            finally:
+                await db.execute('DETACH DATABASE ignore_db')
+                await db.execute('DETACH DATABASE keyword_db')
+        self._guilds = guilds
+
+    def get(self, guild_id: int) -> GuildConfig:
+        return self._guilds.get(guild_id, EMPTY)
+
+    def _config(self, guild_id: int) -> GuildConfig:
+        config = self._guilds.get(guild_id)
+        if config is None:
+            config = self._guilds[guild_id] = GuildConfig()
+        return config
+
+    def set_channels(self, guild_id: int, channels) -> None:
+        config = self._config(guild_id)
+        config.channels = set(channels)
+        config.invalidate()
+
+    def add_channel(self, guild_id: int, channel_id: int) -> None:
+        config = self._config(guild_id)
+        config.channels.add(channel_id)
+        config.invalidate()
+
+    def remove_channel(self, guild_id: int, channel_id: int) -> None:
+        config = self._config(guild_id)
+        config.channels.discard(channel_id)
+        config.invalidate()
+
+    def set_ignored(self, guild_id: int, channels) -> None:
+        config = self._config(guild_id)
+        config.ignored = set(channels)
+        config.invalidate()
+
+    def add_ignored(self, guild_id: int, channel_id: int) -> None:
+        config = self._config(guild_id)
+        config.ignored.add(channel_id)
+        config.invalidate()
+
+    def remove_ignored(self, guild_id: int, channel_id: int) -> None:
+        config = self._config(guild_id)
+        config.ignored.discard(channel_id)
+        config.invalidate()
+
+    def add_keyword(self, guild_id: int, keyword: str) -> None:
+        config = self._config(guild_id)
+        if keyword not in config.keywords:
+            config.keywords.append(keyword)
+            config.invalidate()
+
+    def remove_keyword(self, guild_id: int, keyword: str) -> None:
+        config = self._config(guild_id)
+        if keyword in config.keywords:
+            config.keywords.remove(keyword)
+            config.invalidate()
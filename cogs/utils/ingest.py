@@ -0,0 +1,168 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Hashable, NamedTuple, Optional, Tuple
+
+POLICIES = ('block', 'drop', 'spill')
+
+class Event(NamedTuple):
+    kind: str
+    guild_id: int
+    channel_id: int
+    message_id: int
+    user_id: int = 0
+    # New content and attachment count for edits
+    content: str = ''
+    attachments: int = 0
+    # Every message of a bulk delete
+    message_ids: Tuple[int, ...] = ()
+    enqueued: float = 0.0
+    # Resolved once the event has been handled, for events handed over with submit()
+    done: Optional[asyncio.Future] = None
+
+class _Shard:
+    __slots__ = ('queue', 'spill', 'room', 'task')
+
+    def __init__(self, size: int) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+        self.spill: deque = deque()
+        # Set whenever the worker has taken events out of a full overflow
+        self.room = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+class IngestQueue:
+    """Bounded event queues drained by a pool of workers.
+
+    Events with the same key always land on the same worker, so they are handled
+    in the order they were put. When a queue is full the policy decides what happens:
+    ``block`` makes the caller wait, ``drop`` discards the event and ``spill`` keeps
+    it in an overflow list that the worker empties once the queue is. The overflow
+    holds at most ``max_spill`` events per worker, past that ``spill`` drops too and
+    counts it like ``drop`` does.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Event], Awaitable[None]],
+        *,
+        workers: int = 4,
+        size: int = 1000,
+        policy: str = 'block',
+        max_spill: int = 10000,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown ingest policy {policy!r}, expected one of {", ".join(POLICIES)}')
+        self.handler = handler
+        self.policy = policy
+        self.max_spill = max(1, max_spill)
+        self.processed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._shards = [_Shard(size) for _ in range(max(1, workers))]
+
+    @property
+    def depth(self) -> int:
+        return sum(shard.queue.qsize() + len(shard.spill) for shard in self._shards)
+
+    def stats(self) -> dict:
+        return {
+            'workers': len(self._shards),
+            'policy': self.policy,
+            'depth': self.depth,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'errors': self.errors,
+            'last_lag': self.last_lag,
+            'max_lag': self.max_lag,
+        }
+
+    def start(self) -> None:
+        for shard in self._shards:
+            if shard.task is None:
+                shard.task = asyncio.create_task(self._work(shard))
+
+    async def put(self, key: Hashable, event: Event) -> None:
+        shard = self._shards[hash(key) % len(self._shards)]
+        event = event._replace(enqueued=time.monotonic())
+        if shard.spill:
+            # Older events are still waiting in the overflow, keep behind them
+            self._spill(shard, event)
+            return
+        if self.policy == 'block':
+            await shard.queue.put(event)
+            return
+        try:
+            shard.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.policy == 'drop':
+                self.dropped += 1
+            else:
+                self._spill(shard, event)
+
+    def _spill(self, shard: _Shard, event: Event) -> None:
+        if len(shard.spill) >= self.max_spill:
+            self.dropped += 1
+        else:
+            shard.spill.append(event)
+            self.spilled += 1
+
+    async def submit(self, key: Hashable, event: Event) -> asyncio.Future:
+        """Queues an event like put() and returns a future resolved once it has been handled.
+
+        The event is never dropped, whatever the policy the caller waits for room instead.
+        """
+        shard = self._shards[hash(key) % len(self._shards)]
+        while len(shard.spill) >= self.max_spill:
+            shard.room.clear()
+            await shard.room.wait()
+        done = asyncio.get_running_loop().create_future()
+        event = event._replace(enqueued=time.monotonic(), done=done)
+        if shard.spill:
+            shard.spill.append(event)
+            self.spilled += 1
+        else:
+            await shard.queue.put(event)
+        return done
+
+    async def close(self) -> None:
+        """Handles everything already queued, then stops the workers"""
+        for shard in self._shards:
+            if shard.task is not None:
+                await shard.queue.join()
+                shard.task.cancel()
+                try:
+                    await shard.task
+                except asyncio.CancelledError:
+                    pass
+                shard.task = None
+
+    async def _work(self, shard: _Shard) -> None:
+        queue = shard.queue
+        while True:
+            event = await queue.get()
+            try:
+                lag = time.monotonic() - event.enqueued
+                self.last_lag = lag
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                await self.handler(event)
+                self.processed += 1
+                if event.done is not None and not event.done.done():
+                    event.done.set_result(None)
+            except Exception as e:
+                self.errors += 1
+                print(f'Error handling {event.kind} event: {e}')
+                if event.done is not None and not event.done.done():
+                    event.done.set_exception(e)
+            finally:
+                # Refill from the overflow before marking the event done so close() never
+                # sees an empty queue while spilled events are still waiting
+                while shard.spill and not queue.full():
+                    queue.put_nowait(shard.spill.popleft())
+                if len(shard.spill) < self.max_spill:
+                    shard.room.set()
+                queue.task_done()
@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, List
+
+# Key holding the keywords that end at a trie node, never a valid token since tokens have no spaces
+END = ' '
+
+class KeywordMatcher:
+    """Token trie over a guild's keywords and phrases, matched case-insensitively"""
+
+    __slots__ = ('_root', '_depth')
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self._root: Dict[str, dict] = {}
+        self._depth = 0
+        for keyword in keywords:
+            tokens = keyword.lower().split()
+            if not tokens:
+                continue
+            node = self._root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(END, []).append(keyword)
+            self._depth = max(self._depth, len(tokens))
+
+    def __bool__(self) -> bool:
+        return bool(self._root)
+
+    def count(self, tokens: List[str]) -> Dict[str, int]:
+        """Occurrences of every keyword in a list of lowercased tokens, overlapping ones included"""
+        counts: Dict[str, int] = {}
+        root = self._root
+        if not root:
+            return counts
+        if self._depth == 1:
+            # Single words only, one dict lookup per token
+            for token in tokens:
+                node = root.get(token)
+                if node is not None:
+                    for keyword in node[END]:
+                        counts[keyword] = counts.get(keyword, 0) + 1
+            return counts
+        size = len(tokens)
+        for start in range(size):
+            node = root.get(tokens[start])
+            index = start + 1
+            while node is not None:
+                keywords = node.get(END)
+                if keywords:
+                    for keyword in keywords:
+                        counts[keyword] = counts.get(keyword, 0) + 1
+                if index == size:
+                    break
+                node = node.get(tokens[index])
+                index += 1
+        return counts
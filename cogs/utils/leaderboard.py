@@ -0,0 +1,104 @@
+from typing import List, Optional, Tuple
+import discord
+from paginator import ButtonPaginator
+
+METRICS_DB = 'metrics.db'
+METRICS = ('words', 'messages', 'attachments')
+MEDALS = ('🥇', '🥈', '🥉')
+
+class Leaderboard:
+    """The ranking of a guild, or of one channel in it, by one metric.
+
+    Every query walks the (guild_id, [channel_id,] metric DESC, user_id) index, a page or a rank
+    reads the index entries of the users ranked above it and never the rest of the guild.
+    """
+
+    def __init__(self, db, guild_id: int, metric: str, channel_id: Optional[int] = None) -> None:
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric!r}')
+        self.db = db
+        self.metric = metric
+        # metrics_ranked keeps the guild-wide ranking under channel 0
+        self._ranked_args = (guild_id, channel_id or 0)
+        if channel_id is None:
+            self._table = 'metrics_user'
+            self._where = 'guild_id = ?'
+            self._args: tuple = (guild_id,)
+        else:
+            self._table = 'metrics'
+            self._where = 'guild_id = ? AND channel_id = ?'
+            self._args = (guild_id, channel_id)
+
+    async def _fetch(self, sql: str, args: tuple) -> list:
+        async with self.db.reader(METRICS_DB) as db:
+            async with db.execute(sql, args) as cursor:
+                return await cursor.fetchall()
+
+    async def count(self) -> int:
+        """How many users have anything to rank, kept up to date by the metrics triggers"""
+        rows = await self._fetch(f'SELECT {self.metric} FROM metrics_ranked WHERE guild_id = ? AND channel_id = ?', self._ranked_args)
+        return rows[0][0] if rows else 0
+
+    async def page(self, offset: int, limit: int) -> List[Tuple[int, int]]:
+        """(user id, value) of ranks ``offset + 1`` to ``offset + limit``"""
+        return await self._fetch(
+            f'SELECT user_id, {self.metric} FROM {self._table} WHERE {self._where} AND {self.metric} > 0 '
+            f'ORDER BY {self.metric} DESC, user_id LIMIT ? OFFSET ?',
+            (*self._args, limit, offset),
+        )
+
+    async def rank_of(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """(rank, value) of a user, None if they have nothing to rank.
+
+        Counts the index entries ranked above the user, so it costs O(rank): instant near the top,
+        around 15ms for the last of two hundred thousand users. A deep page's OFFSET costs the same.
+        """
+        rows = await self._fetch(f'SELECT {self.metric} FROM {self._table} WHERE {self._where} AND user_id = ?', (*self._args, user_id))
+        if not rows or rows[0][0] <= 0:
+            return None
+        value = rows[0][0]
+        # Two index range counts, an OR of both conditions would scan every row of the guild
+        rows = await self._fetch(
+            f'SELECT (SELECT COUNT(*) FROM {self._table} WHERE {self._where} AND {self.metric} > ?) + '
+            f'(SELECT COUNT(*) FROM {self._table} WHERE {self._where} AND {self.metric} = ? AND user_id < ?)',
+            (*self._args, value, *self._args, value, user_id),
+        )
+        return rows[0][0] + 1, value
+
+class LeaderboardPaginator(ButtonPaginator):
+    """Pages of a leaderboard, each read from the database when it is shown"""
+
+    def __init__(self, leaderboard: Leaderboard, guild: discord.Guild, total: int, *, title: str, description: str, unit: str,
+                 color: discord.Color, rank: Optional[Tuple[int, int]] = None, per_page: int = 10, **kwargs) -> None:
+        # The pages are page numbers, format_page turns one into an embed
+        super().__init__(range((total + per_page - 1) // per_page), **kwargs)
+        self.leaderboard = leaderboard
+        self.guild = guild
+        self.total = total
+        self.title = title
+        self.description = description
+        self.unit = unit
+        self.color = color
+        self.rank = rank
+        self.rows_per_page = per_page
+
+    async def format_page(self, page: int) -> discord.Embed:
+        start = page * self.rows_per_page
+        lines = []
+        for index, (user_id, count) in enumerate(await self.leaderboard.page(start, self.rows_per_page), start=start + 1):
+            # Members who left are skipped, they keep their rank so every page and the footer agree
+            member = self.guild.get_member(user_id)
+            if member is None:
+                continue
+            if index <= len(MEDALS):
+                lines.append(f"{MEDALS[index - 1]} **{member.display_name}** - {count:,} {self.unit}")
+            else:
+                lines.append(f"**{index}.** {member.display_name} - {count:,} {self.unit}")
+        if not lines:
+            lines.append('Everyone ranked on this page has left the server.')
+        embed = discord.Embed(title=self.title, description=f"{self.description}\n\n" + '\n'.join(lines), color=self.color)
+        footer = f"Page {page + 1}/{self.max_pages} • Total users: {self.total:,}"
+        if self.rank is not None:
+            footer += f" • Your rank: #{self.rank[0]:,} ({self.rank[1]:,} {self.unit})"
+        embed.set_footer(text=footer)
+        return embed
@@ -0,0 +1,151 @@
+import json
+from datetime import timedelta
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+import discord
+from cogs.utils.write_buffer import BatchWriter
+
+LEDGER_DB = 'ledger.db'
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS ledger (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    words INTEGER NOT NULL,
+    attachments INTEGER NOT NULL,
+    keywords TEXT
+    ) WITHOUT ROWID'''
+
+class LedgerEntry(NamedTuple):
+    guild_id: int
+    channel_id: int
+    user_id: int
+    words: int
+    attachments: int
+    keywords: Dict[str, int]
+
+def _row(message_id: int, entry: LedgerEntry) -> tuple:
+    keywords = json.dumps(entry.keywords, separators=(',', ':')) if entry.keywords else None
+    return (message_id, entry.guild_id, entry.channel_id, entry.user_id, entry.words, entry.attachments, keywords)
+
+def _entry(row) -> LedgerEntry:
+    guild_id, channel_id, user_id, words, attachments, keywords = row
+    return LedgerEntry(guild_id, channel_id, user_id, words, attachments, json.loads(keywords) if keywords else {})
+
+class MessageLedger(BatchWriter):
+    """What every counted message added to the counters, so a raw delete or edit can be reversed exactly.
+
+    Entries of messages older than ``retention_days`` are dropped on every flush, deleting or
+    editing such a message leaves the counters alone. 0 keeps every entry.
+    """
+
+    def __init__(self, db, *, retention_days: float = 14, **kwargs) -> None:
+        super().__init__(db, **kwargs)
+        self.retention_days = retention_days
+        self.pruned = 0
+        # message id -> entry to store, or None for one to delete
+        self._pending: Dict[int, Optional[LedgerEntry]] = {}
+        self._writing: Dict[int, Optional[LedgerEntry]] = {}
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    async def create(self) -> None:
+        async with self.db.writer(LEDGER_DB) as db:
+            await db.execute(SCHEMA)
+            await db.commit()
+
+    def record(self, message_id: int, entry: LedgerEntry) -> None:
+        self._pending[message_id] = entry
+        self._check_depth()
+
+    async def get(self, message_id: int) -> Optional[LedgerEntry]:
+        # Unflushed changes first, including the batch a flush is writing right now
+        for pending in (self._pending, self._writing):
+            if message_id in pending:
+                return pending[message_id]
+        async with self.db.reader(LEDGER_DB) as db:
+            async with db.execute(
+                'SELECT guild_id, channel_id, user_id, words, attachments, keywords FROM ledger WHERE message_id = ?', (message_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+        return _entry(row) if row else None
+
+    async def pop(self, message_id: int) -> Optional[LedgerEntry]:
+        entry = await self.get(message_id)
+        if entry is not None:
+            self._pending[message_id] = None
+            self._check_depth()
+        return entry
+
+    def _unflushed(self, message_ids: Iterable[int]):
+        """Splits ids into the entries still held in memory and the ids to look up on disk"""
+        entries: Dict[int, LedgerEntry] = {}
+        missing = []
+        for message_id in message_ids:
+            for pending in (self._pending, self._writing):
+                if message_id in pending:
+                    if pending[message_id] is not None:
+                        entries[message_id] = pending[message_id]
+                    break
+            else:
+                missing.append(message_id)
+        return entries, missing
+
+    async def known(self, message_ids: Iterable[int]) -> Set[int]:
+        """The ids in ``message_ids`` that already have an entry"""
+        entries, missing = self._unflushed(message_ids)
+        found = set(entries)
+        if missing:
+            async with self.db.reader(LEDGER_DB) as db:
+                async with db.execute(f'SELECT message_id FROM ledger WHERE message_id IN ({", ".join("?" * len(missing))})', missing) as cursor:
+                    found.update([row[0] async for row in cursor])
+        return found
+
+    async def pop_many(self, message_ids: Iterable[int]) -> Dict[int, LedgerEntry]:
+        """Entries of every message in ``message_ids`` that has one, all forgotten at once"""
+        entries, missing = self._unflushed(message_ids)
+        if missing:
+            async with self.db.reader(LEDGER_DB) as db:
+                async with db.execute(
+                    f'SELECT message_id, guild_id, channel_id, user_id, words, attachments, keywords FROM ledger '
+                    f'WHERE message_id IN ({", ".join("?" * len(missing))})', missing
+                ) as cursor:
+                    async for row in cursor:
+                        entries[row[0]] = _entry(row[1:])
+        for message_id in entries:
+            self._pending[message_id] = None
+        self._check_depth()
+        return entries
+
+    async def _write(self) -> int:
+        self._writing, self._pending = self._pending, {}
+        writing = self._writing
+        try:
+            async with self.db.writer(LEDGER_DB) as db:
+                await db.executemany(
+                    'INSERT OR REPLACE INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [_row(message_id, entry) for message_id, entry in writing.items() if entry is not None],
+                )
+                await db.executemany(
+                    'DELETE FROM ledger WHERE message_id = ?',
+                    [(message_id,) for message_id, entry in writing.items() if entry is None],
+                )
+                if self.retention_days > 0:
+                    # Message ids start with their creation time, the oldest entries are one range of the key
+                    horizon = discord.utils.time_snowflake(discord.utils.utcnow() - timedelta(days=self.retention_days))
+                    cursor = await db.execute('DELETE FROM ledger WHERE message_id < ?', (horizon,))
+                    pruned = cursor.rowcount
+                else:
+                    pruned = 0
+                await db.commit()
+        except BaseException:
+            # Newer changes made during the failed flush win over the ones being put back
+            for message_id, entry in writing.items():
+                self._pending.setdefault(message_id, entry)
+            raise
+        finally:
+            self._writing = {}
+        self.pruned += pruned
+        return len(writing)
@@ -0,0 +1,23 @@
+from typing import Dict, List
+
+LINK_PREFIXES = ('http://', 'https://')
+
+class MessageAnalysis:
+    """Everything the counters read from a message, worked out with a single split of its content"""
+
+    __slots__ = ('tokens', 'word_count', 'lowered', 'link_count', 'attachment_count')
+
+    def __init__(self, content: str, attachment_count: int = 0) -> None:
+        self.tokens: List[str] = content.split()
+        self.word_count = len(self.tokens)
+        self.lowered: List[str] = [token.lower() for token in self.tokens]
+        self.link_count = sum(1 for token in self.tokens if token.startswith(LINK_PREFIXES))
+        self.attachment_count = attachment_count
+
+    @property
+    def attachments(self) -> int:
+        """Files plus links, the value the attachment leaderboard counts"""
+        return self.attachment_count + self.link_count
+
+    def keyword_counts(self, matcher) -> Dict[str, int]:
+        return matcher.count(self.lowered)
@@ -0,0 +1,192 @@
+import os
+
+# One row per (guild, user, channel) holding every counted metric, plus a per-user
+# rollup kept in step by triggers so guild-wide totals never need an aggregate query.
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS metrics (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        words INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        attachments INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id, channel_id)
+        )''',
+    '''CREATE TABLE IF NOT EXISTS metrics_user (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        words INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        attachments INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+        )''',
+    # Leaderboards walk these in order and stop after a page, user_id makes them covering and breaks ties.
+    # The per-channel ones also serve every (guild_id, channel_id) lookup the old metrics_channel index did.
+    'DROP INDEX IF EXISTS metrics_channel',
+    'CREATE INDEX IF NOT EXISTS metrics_channel_words ON metrics (guild_id, channel_id, words DESC, user_id)',
+    'CREATE INDEX IF NOT EXISTS metrics_channel_messages ON metrics (guild_id, channel_id, messages DESC, user_id)',
+    'CREATE INDEX IF NOT EXISTS metrics_channel_attachments ON metrics (guild_id, channel_id, attachments DESC, user_id)',
+    'CREATE INDEX IF NOT EXISTS metrics_user_words ON metrics_user (guild_id, words DESC, user_id)',
+    'CREATE INDEX IF NOT EXISTS metrics_user_messages ON metrics_user (guild_id, messages DESC, user_id)',
+    'CREATE INDEX IF NOT EXISTS metrics_user_attachments ON metrics_user (guild_id, attachments DESC, user_id)',
+    # How many users rank on each leaderboard, so opening one reads a single row instead of
+    # counting every index entry of the guild. channel_id 0 holds the guild-wide ranking.
+    '''CREATE TABLE IF NOT EXISTS metrics_ranked (
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        words INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        attachments INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, channel_id)
+        ) WITHOUT ROWID''',
+    # Messages added from chat exports, so importing one twice counts nothing twice
+    '''CREATE TABLE IF NOT EXISTS imported (
+        guild_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, message_id)
+        ) WITHOUT ROWID''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_insert AFTER INSERT ON metrics BEGIN
+        INSERT INTO metrics_user (guild_id, user_id, words, messages, attachments)
+        VALUES (NEW.guild_id, NEW.user_id, NEW.words, NEW.messages, NEW.attachments)
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET
+            words = words + excluded.words,
+            messages = messages + excluded.messages,
+            attachments = attachments + excluded.attachments;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_update AFTER UPDATE ON metrics BEGIN
+        UPDATE metrics_user SET
+            words = words + NEW.words - OLD.words,
+            messages = messages + NEW.messages - OLD.messages,
+            attachments = attachments + NEW.attachments - OLD.attachments
+        WHERE guild_id = NEW.guild_id AND user_id = NEW.user_id;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_delete AFTER DELETE ON metrics BEGIN
+        UPDATE metrics_user SET
+            words = words - OLD.words,
+            messages = messages - OLD.messages,
+            attachments = attachments - OLD.attachments
+        WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id;
+        END''',
+)
+
+RANKED_TRIGGERS = (
+    # Only rows that start or stop ranking on some metric touch metrics_ranked
+    '''CREATE TRIGGER IF NOT EXISTS metrics_ranked_insert AFTER INSERT ON metrics
+        WHEN NEW.words > 0 OR NEW.messages > 0 OR NEW.attachments > 0 BEGIN
+        INSERT INTO metrics_ranked (guild_id, channel_id, words, messages, attachments)
+        VALUES (NEW.guild_id, NEW.channel_id, NEW.words > 0, NEW.messages > 0, NEW.attachments > 0)
+        ON CONFLICT (guild_id, channel_id) DO UPDATE SET
+            words = words + excluded.words,
+            messages = messages + excluded.messages,
+            attachments = attachments + excluded.attachments;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_ranked_update AFTER UPDATE ON metrics
+        WHEN (NEW.words > 0) != (OLD.words > 0) OR (NEW.messages > 0) != (OLD.messages > 0) OR (NEW.attachments > 0) != (OLD.attachments > 0) BEGIN
+        INSERT INTO metrics_ranked (guild_id, channel_id, words, messages, attachments)
+        VALUES (NEW.guild_id, NEW.channel_id, (NEW.words > 0) - (OLD.words > 0), (NEW.messages > 0) - (OLD.messages > 0), (NEW.attachments > 0) - (OLD.attachments > 0))
+        ON CONFLICT (guild_id, channel_id) DO UPDATE SET
+            words = words + excluded.words,
+            messages = messages + excluded.messages,
+            attachments = attachments + excluded.attachments;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_ranked_delete AFTER DELETE ON metrics
+        WHEN OLD.words > 0 OR OLD.messages > 0 OR OLD.attachments > 0 BEGIN
+        UPDATE metrics_ranked SET
+            words = words - (OLD.words > 0),
+            messages = messages - (OLD.messages > 0),
+            attachments = attachments - (OLD.attachments > 0)
+        WHERE guild_id = OLD.guild_id AND channel_id = OLD.channel_id;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_user_ranked_insert AFTER INSERT ON metrics_user
+        WHEN NEW.words > 0 OR NEW.messages > 0 OR NEW.attachments > 0 BEGIN
+        INSERT INTO metrics_ranked (guild_id, channel_id, words, messages, attachments)
+        VALUES (NEW.guild_id, 0, NEW.words > 0, NEW.messages > 0, NEW.attachments > 0)
+        ON CONFLICT (guild_id, channel_id) DO UPDATE SET
+            words = words + excluded.words,
+            messages = messages + excluded.messages,
+            attachments = attachments + excluded.attachments;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_user_ranked_update AFTER UPDATE ON metrics_user
+        WHEN (NEW.words > 0) != (OLD.words > 0) OR (NEW.messages > 0) != (OLD.messages > 0) OR (NEW.attachments > 0) != (OLD.attachments > 0) BEGIN
+        INSERT INTO metrics_ranked (guild_id, channel_id, words, messages, attachments)
+        VALUES (NEW.guild_id, 0, (NEW.words > 0) - (OLD.words > 0), (NEW.messages > 0) - (OLD.messages > 0), (NEW.attachments > 0) - (OLD.attachments > 0))
+        ON CONFLICT (guild_id, channel_id) DO UPDATE SET
+            words = words + excluded.words,
+            messages = messages + excluded.messages,
+            attachments = attachments + excluded.attachments;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS metrics_user_ranked_delete AFTER DELETE ON metrics_user
+        WHEN OLD.words > 0 OR OLD.messages > 0 OR OLD.attachments > 0 BEGIN
+        UPDATE metrics_ranked SET
+            words = words - (OLD.words > 0),
+            messages = messages - (OLD.messages > 0),
+            attachments = attachments - (OLD.attachments > 0)
+        WHERE guild_id = OLD.guild_id AND channel_id = 0;
+        END''',
+)
+
+# Fills metrics_ranked from the rows already there when it is first created
+RANKED_COUNTS = '''INSERT INTO metrics_ranked (guild_id, channel_id, words, messages, attachments)
+    SELECT guild_id, channel_id, SUM(words > 0), SUM(messages > 0), SUM(attachments > 0) FROM metrics GROUP BY guild_id, channel_id
+    UNION ALL
+    SELECT guild_id, 0, SUM(words > 0), SUM(messages > 0), SUM(attachments > 0) FROM metrics_user GROUP BY guild_id'''
+
+SCHEMA_VERSION = 1
+
+# (legacy database file, table, column mapped onto words/messages/attachments)
+LEGACY_TABLES = (
+    ('counter.db', 'counters', 'count', 'words'),
+    ('message_channels.db', 'message_channels', 'messages', 'messages'),
+    ('attachments_channels.db', 'attachments_channels', 'count', 'attachments'),
+)
+
+async def create_metrics(db) -> None:
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metrics_ranked'") as cursor:
+        ranked = await cursor.fetchone()
+    for statement in SCHEMA + RANKED_TRIGGERS:
+        await db.execute(statement)
+    if not ranked:
+        # Counted once here, the triggers keep it up to date from then on
+        await db.execute(RANKED_COUNTS)
+    await db.commit()
+
+async def migrate_legacy(db) -> int:
+    """Imports the per-channel rows of the old split databases once.
+
+    The per-user tables (server, message_user, attachments_users) are not read,
+    their totals are rebuilt from the per-channel rows by the rollup triggers.
+    """
+    async with db.execute('PRAGMA user_version') as cursor:
+        version = (await cursor.fetchone())[0]
+    if version >= SCHEMA_VERSION:
+        return 0
+    legacy = [(f'legacy{index}', path, table, column, metric) for index, (path, table, column, metric) in enumerate(LEGACY_TABLES) if os.path.exists(path)]
+    # Everything is attached up front, SQLite refuses to inside a transaction, so all
+    # tables and the version go in one commit and a failed start imports nothing twice
+    attached = []
+    try:
+        for schema, path, *_ in legacy:
+            await db.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+            attached.append(schema)
+        imported = 0
+        try:
+            for schema, _, table, column, metric in legacy:
+                async with db.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)) as cursor:
+                    exists = await cursor.fetchone()
+                if not exists:
+                    continue
+                cursor = await db.execute(
+                    f'''INSERT INTO metrics (guild_id, user_id, channel_id, {metric})
+                    SELECT guild_id, user_id, channel_id, COALESCE({column}, 0) FROM {schema}.{table} WHERE true
+                    ON CONFLICT (guild_id, user_id, channel_id) DO UPDATE SET {metric} = {metric} + excluded.{metric}'''
+                )
+                imported += cursor.rowcount
+            await db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    finally:
+        for schema in attached:
+            await db.execute(f'DETACH DATABASE {schema}')
+    return imported
@@ -0,0 +1,148 @@
+import abc
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+# table -> (database file, key columns, counter columns)
+TABLES = {
+    'metrics': ('metrics.db', ('guild_id', 'user_id', 'channel_id'), ('words', 'messages', 'attachments')),
+    'keyword_channel': ('keyword_channel.db', ('guild_id', 'channel_id', 'keyword', 'user_id'), ('count',)),
+    'keyword_user': ('keyword_user.db', ('guild_id', 'user_id', 'keyword'), ('count',)),
+}
+
+class BatchWriter(abc.ABC):
+    """Holds pending writes in memory and hands them to _write() on a timer or once enough pile up"""
+
+    def __init__(self, db, *, max_pending: int = 5000, interval: float = 5.0) -> None:
+        self.db = db
+        self.max_pending = max_pending
+        self.interval = interval
+        self.last_flush_latency = 0.0
+        self.last_flush_rows = 0
+        self.flushes = 0
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+    @property
+    @abc.abstractmethod
+    def depth(self) -> int:
+        """How many rows are waiting to be written"""
+
+    def stats(self) -> dict:
+        return {
+            'depth': self.depth,
+            'flushes': self.flushes,
+            'last_flush_rows': self.last_flush_rows,
+            'last_flush_latency': self.last_flush_latency,
+        }
+
+    def _check_depth(self) -> None:
+        if self.depth >= self.max_pending:
+            self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # Let the loop finish on its own, cancelling a flush half way would
+            # re-add a file that was already committed and write it twice
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._closing:
+                return
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f'Error flushing {type(self).__name__}: {e}')
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self.depth:
+                return
+            start = time.perf_counter()
+            rows = await self._write()
+            self.last_flush_latency = time.perf_counter() - start
+            self.last_flush_rows = rows
+            self.flushes += 1
+
+    @abc.abstractmethod
+    async def _write(self) -> int:
+        """Writes out everything pending and returns how many rows that was"""
+
+class WriteBuffer(BatchWriter):
+    """Coalesces counter deltas in memory and writes them out in batches"""
+
+    def __init__(self, db, **kwargs) -> None:
+        super().__init__(db, **kwargs)
+        self._pending: Dict[str, Dict[Tuple, list]] = defaultdict(dict)
+        self._depth = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def add(self, table: str, key: Tuple, *deltas: int) -> None:
+        rows = self._pending[table]
+        row = rows.get(key)
+        if row is None:
+            rows[key] = list(deltas)
+            self._depth += 1
+            self._check_depth()
+        else:
+            for i, delta in enumerate(deltas):
+                row[i] += delta
+
+    async def _write(self) -> int:
+        pending, self._pending = self._pending, defaultdict(dict)
+        rows = self._depth
+        self._depth = 0
+        by_file = defaultdict(list)
+        for table, keys in pending.items():
+            by_file[TABLES[table][0]].append((table, keys))
+        files = list(by_file.items())
+        for index, (path, tables) in enumerate(files):
+            try:
+                await self._apply(path, tables)
+            except BaseException:
+                # Put back whatever was not committed so nothing is lost
+                for _, unapplied in files[index:]:
+                    for table, keys in unapplied:
+                        for key, deltas in keys.items():
+                            self.add(table, key, *deltas)
+                raise
+        return rows
+
+    async def _apply(self, path: str, tables: list) -> None:
+        async with self.db.writer(path) as db:
+            for table, keys in tables:
+                await upsert_deltas(db, table, keys)
+            await db.commit()
+
+async def upsert_deltas(db, table: str, keys: Dict[Tuple, list]) -> None:
+    """Adds the deltas of every key to ``table`` of ``db``, leaving the commit to the caller"""
+    _, key_columns, columns = TABLES[table]
+    # Decrements never take a counter below zero, even for rows that do not exist yet
+    upsert = (
+        f'INSERT INTO {table} ({", ".join(key_columns + columns)}) '
+        f'VALUES ({", ".join("?" * len(key_columns))}, {", ".join("MAX(?, 0)" for _ in columns)}) '
+        f'ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET '
+        + ', '.join(f'{column} = MAX({column} + ?, 0)' for column in columns)
+    )
+    rows = [(*key, *deltas, *deltas) for key, deltas in keys.items() if any(deltas)]
+    await db.executemany(upsert, rows)
@@ -71,6 +71,22 @@ class Extensions(commands.Cog):
         if failed:
             await ctx.send(f'Failed to load cogs: {", ".join(failed)}')
 
+    @commands.command(name="buffer", description="Shows the state of the counter write buffer", hidden=True)
+    @commands.is_owner()
+    async def buffer(self, ctx: commands.Context) -> None:
+        stats = self.bot.write_buffer.stats()
+        await ctx.send(f'Pending rows: {stats["depth"]}\nFlushes: {stats["flushes"]}\nLast flush: {stats["last_flush_rows"]} rows in {stats["last_flush_latency"] * 1000:.1f}ms')
+
+    @commands.command(name="ingest", description="Shows the state of the message event queue", hidden=True)
+    @commands.is_owner()
+    async def ingest(self, ctx: commands.Context) -> None:
+        counter = self.bot.get_cog('Counter')
+        if counter is None:
+            await ctx.send("Counter cog is not loaded.")
+            return
+        stats = counter.ingest.stats()
+        await ctx.send(f'Workers: {stats["workers"]} ({stats["policy"]})\nQueued events: {stats["depth"]}\nProcessed: {stats["processed"]}, dropped: {stats["dropped"]}, spilled: {stats["spilled"]}, errors: {stats["errors"]}\nLag: {stats["last_lag"] * 1000:.1f}ms (max {stats["max_lag"] * 1000:.1f}ms)')
+
 async def setup(bot) -> None:
     await bot.add_cog(Extensions(bot))
     print(f'Extensions cog loaded')
\ No newline at end of file
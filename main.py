@@ -13,18 +13,29 @@ from itertools import groupby
 import logging
 import random
 import asyncio
+from cogs.utils.database import DatabaseManager
+from cogs.utils.write_buffer import WriteBuffer
+from cogs.utils.guild_config import GuildConfigCache
+from cogs.utils.ledger import MessageLedger
 
 load_dotenv()
 
 intents = discord.Intents.all()
 
-handler = logging.FileHandler(filename='discord.log', encoding='utf-8', mode='w')
-
 class MyBot(commands.Bot):
     def __init__(self) -> None:
-        super().__init__(command_prefix='!wc', intents=intents)
+        # Deletes and edits are counted from the message ledger, not the message cache
+        super().__init__(command_prefix='!wc', intents=intents, max_messages=None)
+        self.db = DatabaseManager()
+        self.write_buffer = WriteBuffer(self.db)
+        self.ledger = MessageLedger(self.db, retention_days=float(os.getenv('LEDGER_RETENTION_DAYS', 14)))
+        self.config = GuildConfigCache(self.db)
     
     async def setup_hook(self) -> None:
+        await self.config.load()
+        await self.ledger.create()
+        self.write_buffer.start()
+        self.ledger.start()
         await self.load_extension('sync')
         await self.load_extension('ext')
         for filename in os.listdir('cogs'):
@@ -32,8 +43,18 @@ class MyBot(commands.Bot):
                 cog_name = filename[:-3]  # Remove the .py extension
                 await bot.load_extension(f'cogs.{cog_name}')
 
-bot = MyBot()
+    async def close(self) -> None:
+        await super().close()
+        await self.write_buffer.close()
+        await self.ledger.close()
+        await self.db.close()
+
+# Chat analysis workers import this module on start, only the bot process may run the bot
+if __name__ == '__main__':
+    handler = logging.FileHandler(filename='discord.log', encoding='utf-8', mode='w')
+
+    bot = MyBot()
 
-API_TOKEN = str(os.getenv('API_TOKEN'))
+    API_TOKEN = str(os.getenv('API_TOKEN'))
 
-bot.run(API_TOKEN, log_handler=handler, log_level=logging.ERROR)
\ No newline at end of file
+    bot.run(API_TOKEN, log_handler=handler, log_level=logging.ERROR)
\ No newline at end of file
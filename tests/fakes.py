@@ -0,0 +1,74 @@
+from contextlib import asynccontextmanager
+from cogs.counter import Counter
+from cogs.keyword import Keyword
+from cogs.utils.database import DatabaseManager
+from cogs.utils.guild_config import GuildConfigCache
+from cogs.utils.ledger import MessageLedger
+from cogs.utils.write_buffer import WriteBuffer
+
+class FakeTree:
+    def add_command(self, command) -> None:
+        pass
+
+    def remove_command(self, name, **kwargs) -> None:
+        pass
+
+class FakeBot:
+    """The parts of MyBot the counting cogs use, over databases in the working directory"""
+
+    def __init__(self) -> None:
+        self.db = DatabaseManager()
+        self.write_buffer = WriteBuffer(self.db)
+        # The small message ids of the tests date from 2015, past any retention window
+        self.ledger = MessageLedger(self.db, retention_days=0)
+        self.config = GuildConfigCache(self.db)
+        self.tree = FakeTree()
+        self.cogs = {}
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+    async def fetch(self, path: str, sql: str, args: tuple = ()) -> list:
+        async with self.db.reader(path) as conn:
+            async with conn.execute(sql, args) as cursor:
+                return await cursor.fetchall()
+
+@asynccontextmanager
+async def running_bot():
+    """A FakeBot with the Counter and Keyword cogs loaded, everything flushed and closed on exit"""
+    bot = FakeBot()
+    await bot.config.load()
+    await bot.ledger.create()
+    for cog in (Keyword(bot), Counter(bot)):
+        await cog.cog_load()
+        bot.cogs[type(cog).__name__] = cog
+    try:
+        yield bot
+    finally:
+        await bot.cogs['Counter'].cog_unload()
+        await bot.write_buffer.close()
+        await bot.ledger.close()
+        await bot.db.close()
+
+def group(user_id, messages):
+    """An author group the way DiscordChatExporter writes one, ``messages`` are (id, 'DD/MM/YYYY HH:MM', text)"""
+    parts = ['<div class="chatlog__message-group">']
+    for index, (message_id, timestamp, text) in enumerate(messages):
+        parts.append(f'<div class="chatlog__message-container" data-message-id="{message_id}"><div class="chatlog__message">')
+        if index == 0:
+            parts.append(
+                '<div class="chatlog__message-primary"><div class="chatlog__header">'
+                f'<span class="chatlog__author" title="user{user_id[0]}" data-user-id="{user_id}">user</span> '
+                f'<span class="chatlog__timestamp"><a href="#">{timestamp}</a></span></div>'
+            )
+        else:
+            parts.append(
+                f'<div class="chatlog__message-aside"><div class="chatlog__short-timestamp" title="{timestamp}">{timestamp[-5:]}</div></div>'
+                '<div class="chatlog__message-primary">'
+            )
+        parts.append(f'<div class="chatlog__content chatlog__markdown"><span class="chatlog__markdown-preserve">{text}</span></div></div></div></div>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+def export(*groups):
+    return f'<html><body><div class="chatlog">{"".join(groups)}</div></body></html>'.encode()
@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+import discord
+from cogs.utils.backfill import BACKFILL_DB, BackfillJob, create_checkpoints
+from cogs.utils.ingest import Event
+from fakes import running_bot
+
+GUILD = 1
+COUNTED, LEGACY = 10, 11
+ALICE, BOB, BOT = 100, 200, 300
+# Counting was enabled for COUNTED just before message 1000
+STARTED = 1000
+
+def channel(channel_id):
+    return SimpleNamespace(id=channel_id, name=f'channel-{channel_id}', type=discord.ChannelType.text, parent_id=None)
+
+def message(channel, message_id, user_id, content, attachments=0):
+    author = SimpleNamespace(id=user_id, bot=user_id == BOT)
+    return SimpleNamespace(id=message_id, channel=channel, author=author, content=content, attachments=[object()] * attachments)
+
+class FakeHistory:
+    """A channel history served the way discord_history pages it, recording every crawl"""
+
+    def __init__(self, messages) -> None:
+        self.messages = sorted(messages, key=lambda message: message.id)
+        self.crawls = []
+
+    async def __call__(self, channel, after, before):
+        self.crawls.append((channel.id, after, before))
+        for message in self.messages:
+            if message.channel.id == channel.id and (after is None or message.id > after) and message.id < before:
+                await asyncio.sleep(0)
+                yield message
+
+async def totals(bot):
+    return await bot.fetch('metrics.db', 'SELECT channel_id, user_id, words, messages, attachments FROM metrics ORDER BY channel_id, user_id')
+
+def test_backfill_counts_history_up_to_the_counting_start_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    counted, legacy = channel(COUNTED), channel(LEGACY)
+    history = FakeHistory([
+        message(counted, 1, ALICE, 'one two', 1),
+        message(counted, 2, BOB, 'three'),
+        message(counted, 3, BOT, 'beep boop'),
+        message(counted, 4, ALICE, 'four five six'),
+        message(counted, 5, BOB, 'seven eight'),
+        message(counted, 6, ALICE, 'nine'),
+        # Sent after counting started, the live listener counted it
+        message(counted, 1001, ALICE, 'live words here'),
+        message(legacy, 7, BOB, 'older legacy words'),
+    ])
+
+    async def run():
+        async with running_bot() as bot:
+            bot.config.add_channel(GUILD, COUNTED)
+            bot.config.add_channel(GUILD, LEGACY)
+            await create_checkpoints(bot.db)
+            async with bot.db.writer(BACKFILL_DB) as conn:
+                await conn.execute('INSERT INTO counting_started VALUES (?, ?, ?)', (GUILD, COUNTED, STARTED))
+            counter = bot.cogs['Counter']
+            await counter.process_event(Event('create', GUILD, COUNTED, 1001, ALICE, 'live words here'))
+            # LEGACY was counted before starts were recorded
+            await counter.process_event(Event('create', GUILD, LEGACY, 2000, BOB, 'legacy'))
+            await bot.write_buffer.flush()
+
+            # The live create of message 4 lands right after the backfill looked it up
+            known = bot.ledger.known
+
+            async def known_then_live(message_ids):
+                found = await known(message_ids)
+                if 4 in message_ids:
+                    await counter.ingest.put((GUILD, COUNTED), Event('create', GUILD, COUNTED, 4, ALICE, 'four five six'))
+                return found
+            bot.ledger.known = known_then_live
+            job = BackfillJob(bot, GUILD, [counted, legacy], history=history, batch_size=2)
+            await job.run()
+            bot.ledger.known = known
+            first = await totals(bot), job.stats()
+
+            # Every channel is done or left alone, a second run crawls nothing
+            again = BackfillJob(bot, GUILD, [counted, legacy], history=history, batch_size=2)
+            await again.run()
+            second = await totals(bot), again.stats()
+
+            # Told when counting started, the legacy channel is crawled up to then
+            since = BackfillJob(bot, GUILD, [legacy], history=history, counted_since=datetime(2015, 1, 2))
+            await since.run()
+            third = await totals(bot), since.stats()
+            checkpoints = await bot.fetch(BACKFILL_DB, 'SELECT channel_id, counted, done FROM backfill_checkpoints ORDER BY channel_id')
+            return first, second, third, checkpoints, history.crawls
+
+    first, second, third, checkpoints, crawls = asyncio.run(run())
+    expected = [(COUNTED, ALICE, 9, 4, 1), (COUNTED, BOB, 3, 2, 0), (LEGACY, BOB, 1, 1, 0)]
+    assert first[0] == expected
+    assert first[1]['counted'] + first[1]['skipped'] == 6
+    assert first[1]['finished_channels'] == 1
+    assert first[1]['unknown_start_channels'] == 1
+    assert second[0] == expected
+    assert second[1]['counted'] == 0
+    assert third[0] == [(COUNTED, ALICE, 9, 4, 1), (COUNTED, BOB, 3, 2, 0), (LEGACY, BOB, 4, 2, 0)]
+    assert third[1]['counted'] == 1
+    assert checkpoints[0][0] == COUNTED and checkpoints[0][2] == 1
+    assert checkpoints[1] == (LEGACY, 1, 1)
+    assert all(before == STARTED for channel_id, _, before in crawls if channel_id == COUNTED)
+    assert [channel_id for channel_id, _, _ in crawls] == [COUNTED, LEGACY]
+
+def test_backfill_records_unexpected_errors_and_finishes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    broken, counted = channel(LEGACY), channel(COUNTED)
+    history = FakeHistory([message(counted, 1, ALICE, 'one two')])
+
+    async def failing_history(channel, after, before):
+        if channel.id == LEGACY:
+            raise ValueError('malformed page')
+        async for message in history(channel, after, before):
+            yield message
+
+    async def run():
+        async with running_bot() as bot:
+            await create_checkpoints(bot.db)
+            async with bot.db.writer(BACKFILL_DB) as conn:
+                for channel_id in (COUNTED, LEGACY):
+                    await conn.execute('INSERT INTO counting_started VALUES (?, ?, ?)', (GUILD, channel_id, STARTED))
+            bot.config.add_channel(GUILD, COUNTED)
+            bot.config.add_channel(GUILD, LEGACY)
+            job = BackfillJob(bot, GUILD, [broken, counted], history=failing_history)
+            await job.run()
+
+            # Without the Counter cog nothing is crawled
+            counter = bot.cogs.pop('Counter')
+            orphan = BackfillJob(bot, GUILD, [counted], history=history)
+            await orphan.run()
+            bot.cogs['Counter'] = counter
+            return job.stats(), orphan.stats(), await totals(bot)
+
+    stats, orphan, counts = asyncio.run(run())
+    assert stats['finished'] and orphan['finished']
+    assert (stats['failed_channels'], stats['finished_channels']) == (1, 1)
+    assert stats['error'] == 'channel-11: ValueError: malformed page'
+    assert orphan['error'] == 'The Counter cog is not loaded'
+    assert counts == [(COUNTED, ALICE, 2, 1, 0)]
@@ -0,0 +1,32 @@
+from cogs.utils.chat_analyzer import ChatDataset, analyze_chat_history, build_analysis
+from fakes import export, group
+
+ALICE, BOB = '111111111111111111', '222222222222222222'
+
+def test_every_message_of_a_group_is_a_row():
+    dataset = analyze_chat_history(export(group(ALICE, [(1000, '01/01/2024 10:00', 'one two'), (1001, '01/01/2024 10:01', 'three')])))
+    assert list(dataset.id) == [1000, 1001]
+    assert list(dataset.words) == [2, 1]
+    assert dataset.ts[1] - dataset.ts[0] == 60
+
+def test_overlapping_exports_grouped_differently_merge_exactly():
+    # The first export ends while Alice is still writing
+    first = analyze_chat_history(export(
+        group(ALICE, [(1000, '01/01/2024 10:00', 'one two'), (1001, '01/01/2024 10:01', 'three')]),
+        group(BOB, [(1002, '01/01/2024 10:02', 'four')]),
+        group(ALICE, [(1003, '01/01/2024 10:03', 'five six')]),
+    ))
+    # The next one starts in the middle of a group and has Alice's later messages in hers
+    second = analyze_chat_history(export(
+        group(ALICE, [(1001, '01/01/2024 10:01', 'three')]),
+        group(BOB, [(1002, '01/01/2024 10:02', 'four')]),
+        group(ALICE, [(1003, '01/01/2024 10:03', 'five six'), (1004, '01/01/2024 10:04', 'seven eight nine')]),
+        group(BOB, [(1005, '01/01/2024 10:05', 'ten')]),
+    ))
+    history = ChatDataset()
+    assert history.merge_new(first) == 4
+    assert history.merge_new(second) == 2
+    assert list(history.id) == [1000, 1001, 1002, 1003, 1004, 1005]
+    analysis = build_analysis(history)
+    assert (analysis.messages, analysis.words) == (6, 10)
+    assert analysis.top_words == [(ALICE, 8), (BOB, 2)]
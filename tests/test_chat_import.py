@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+import discord
+from cogs.utils.backfill import BACKFILL_DB, BackfillJob, counting_started, create_checkpoints
+from cogs.utils.chat_analyzer import analyze_chat_history
+from cogs.utils.chat_import import import_dataset
+from cogs.utils.guild_config import ALL_CHANNELS
+from cogs.utils.ingest import Event
+from fakes import export, group, running_bot
+
+GUILD, CHANNEL = 1, 10
+ALICE, BOB = 111111111111111111, 222222222222222222
+
+def test_import_counts_every_message_of_a_group_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dataset = analyze_chat_history(export(
+        group(str(ALICE), [(1000, '01/01/2024 10:00', 'one two'), (1001, '01/01/2024 10:01', 'three')]),
+        group(str(BOB), [(1002, '01/01/2024 10:02', 'four')]),
+    ))
+    channel = SimpleNamespace(id=CHANNEL, name='general', type=discord.ChannelType.text, parent_id=None)
+    author = {user_id: SimpleNamespace(id=user_id, bot=False) for user_id in (ALICE, BOB)}
+    history = [
+        SimpleNamespace(id=1000, channel=channel, author=author[ALICE], content='one two', attachments=[]),
+        SimpleNamespace(id=1001, channel=channel, author=author[ALICE], content='three', attachments=[]),
+        SimpleNamespace(id=1002, channel=channel, author=author[BOB], content='four', attachments=[]),
+        SimpleNamespace(id=1003, channel=channel, author=author[BOB], content='five six', attachments=[]),
+    ]
+
+    async def fake_history(channel, after, before):
+        for message in history:
+            if (after is None or message.id > after) and message.id < before:
+                yield message
+
+    async def run():
+        async with running_bot() as bot:
+            bot.config.add_channel(GUILD, CHANNEL)
+            # The second message of Alice's group was counted live
+            await bot.cogs['Counter'].process_event(Event('create', GUILD, CHANNEL, 1001, ALICE, 'three'))
+            await bot.write_buffer.flush()
+            await bot.ledger.flush()
+
+            added = await import_dataset(bot.db, GUILD, CHANNEL, dataset)
+            again = await import_dataset(bot.db, GUILD, CHANNEL, dataset)
+            imported = await bot.fetch('metrics.db', 'SELECT message_id FROM imported ORDER BY message_id')
+
+            await create_checkpoints(bot.db)
+            async with bot.db.writer(BACKFILL_DB) as conn:
+                await conn.execute('INSERT INTO counting_started VALUES (?, ?, ?)', (GUILD, CHANNEL, 2000))
+            job = BackfillJob(bot, GUILD, [channel], history=fake_history)
+            await job.run()
+            totals = await bot.fetch('metrics.db', 'SELECT user_id, words, messages FROM metrics_user ORDER BY user_id')
+            return added, again, imported, job.stats()['counted'], totals
+
+    added, again, imported, backfilled, totals = asyncio.run(run())
+    assert (added, again) == (2, 0)
+    assert imported == [(1000,), (1002,)]
+    assert backfilled == 1
+    assert totals == [(ALICE, 3, 2), (BOB, 3, 2)]
+
+def test_import_stops_where_counting_started(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dataset = analyze_chat_history(export(
+        group(str(ALICE), [(1000, '01/01/2024 10:00', 'one two'), (1001, '01/01/2024 10:01', 'three')]),
+        # Counted live from here on, their ledger entries are past the retention window
+        group(str(BOB), [(1002, '01/01/2024 10:02', 'four'), (1003, '01/01/2024 10:03', 'five six')]),
+    ))
+
+    async def run():
+        async with running_bot() as bot:
+            await create_checkpoints(bot.db)
+            async with bot.db.writer(BACKFILL_DB) as conn:
+                # Enabled for the whole server
+                await conn.execute('INSERT INTO counting_started VALUES (?, ?, ?)', (GUILD, ALL_CHANNELS, 1002))
+            before = await counting_started(bot.db, GUILD, CHANNEL)
+            added = await import_dataset(bot.db, GUILD, CHANNEL, dataset, before=before)
+            totals = await bot.fetch('metrics.db', 'SELECT user_id, words, messages FROM metrics_user ORDER BY user_id')
+            return before, added, totals
+
+    before, added, totals = asyncio.run(run())
+    assert before == 1002
+    assert added == 2
+    assert totals == [(ALICE, 3, 2)]
@@ -0,0 +1,73 @@
+import asyncio
+import cogs.counter
+from cogs.utils.ingest import Event
+from fakes import running_bot
+
+GUILD, CHANNEL = 1, 10
+ALICE, BOB = 100, 200
+
+def create(message_id, user_id, content, attachments=0):
+    return Event('create', GUILD, CHANNEL, message_id, user_id, content, attachments)
+
+def test_bulk_delete_reverses_the_purge(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run():
+        async with running_bot() as bot:
+            bot.config.add_keyword(GUILD, 'hello')
+            counter = bot.cogs['Counter']
+            await counter.process_event(create(1, ALICE, 'hello there hello', 1))
+            await counter.process_event(create(2, ALICE, 'hello world'))
+            await counter.process_event(create(3, BOB, 'hello'))
+            # One purged message is still only in the ledger's memory, the others are on disk
+            await bot.ledger.flush()
+            await counter.process_event(create(4, ALICE, 'one two three four'))
+
+            await counter.process_event(Event('bulk_delete', GUILD, CHANNEL, 0, message_ids=(1, 4, 99)))
+            # Nothing of the purge is left waiting on a timer
+            assert bot.write_buffer.depth == 0
+            return (
+                await bot.fetch('metrics.db', 'SELECT user_id, words, messages, attachments FROM metrics_user ORDER BY user_id'),
+                await bot.fetch('keyword_user.db', 'SELECT user_id, keyword, count FROM keyword_user ORDER BY user_id'),
+                await bot.fetch('keyword_channel.db', 'SELECT user_id, keyword, count FROM keyword_channel ORDER BY user_id'),
+                await bot.fetch('ledger.db', 'SELECT message_id FROM ledger ORDER BY message_id'),
+            )
+
+    metrics, keyword_user, keyword_channel, ledger = asyncio.run(run())
+    assert metrics == [(ALICE, 2, 1, 0), (BOB, 1, 1, 0)]
+    assert keyword_user == [(ALICE, 'hello', 1), (BOB, 'hello', 1)]
+    assert keyword_channel == [(ALICE, 'hello', 1), (BOB, 'hello', 1)]
+    assert ledger == [(2,), (3,)]
+
+def test_failed_purge_leaves_only_what_was_not_committed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    upsert_deltas = cogs.counter.upsert_deltas
+
+    async def failing_keyword_user(db, table, keys):
+        if table == 'keyword_user':
+            raise RuntimeError('disk full')
+        await upsert_deltas(db, table, keys)
+
+    async def run():
+        async with running_bot() as bot:
+            bot.config.add_keyword(GUILD, 'hello')
+            counter = bot.cogs['Counter']
+            await counter.process_event(create(1, ALICE, 'hello there hello', 1))
+            await counter.process_event(create(2, ALICE, 'hello world'))
+            monkeypatch.setattr(cogs.counter, 'upsert_deltas', failing_keyword_user)
+            try:
+                await counter.bulk_delete((1,))
+            except RuntimeError:
+                pass
+            monkeypatch.setattr(cogs.counter, 'upsert_deltas', upsert_deltas)
+            # The metrics and keyword_channel decrements were committed, only keyword_user's are retried
+            await bot.write_buffer.flush()
+            return (
+                await bot.fetch('metrics.db', 'SELECT user_id, words, messages, attachments FROM metrics_user'),
+                await bot.fetch('keyword_user.db', 'SELECT user_id, keyword, count FROM keyword_user'),
+                await bot.fetch('keyword_channel.db', 'SELECT user_id, keyword, count FROM keyword_channel'),
+            )
+
+    metrics, keyword_user, keyword_channel = asyncio.run(run())
+    assert metrics == [(ALICE, 2, 1, 0)]
+    assert keyword_user == keyword_channel == [(ALICE, 'hello', 1)]
@@ -0,0 +1,23 @@
+import os
+from cogs.utils.chat_analyzer import analyze_chat_history
+from cogs.utils.dataset_cache import SourceStore
+from fakes import export, group
+
+ALICE = '111111111111111111'
+
+def test_unreadable_source_starts_over(tmp_path, capsys):
+    store = SourceStore(str(tmp_path))
+    dataset = analyze_chat_history(export(group(ALICE, [(1000, '01/01/2024 10:00', 'one two'), (1001, '01/01/2024 10:01', 'three')])))
+    store.save(1, 'General', dataset)
+    assert list(store.load(1, 'general').id) == [1000, 1001]
+    assert os.listdir(tmp_path / '1') == [os.path.basename(store._path(1, 'general'))]
+
+    path = store._path(1, 'general')
+    with open(path, 'rb') as file:
+        data = file.read()
+    # Cut short by a crash, then written by an older layout
+    for broken in (data[:len(data) - 3], b'chat-dataset 2\n' + data[15:]):
+        with open(path, 'wb') as file:
+            file.write(broken)
+        assert len(store.load(1, 'general').id) == 0
+        assert 'Starting the stored history' in capsys.readouterr().out
@@ -0,0 +1,32 @@
+import asyncio
+from cogs.utils.ingest import Event, IngestQueue
+
+def test_spill_is_bounded_and_counts_drops():
+    async def run():
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(event):
+            await release.wait()
+            handled.append(event.message_id)
+
+        ingest = IngestQueue(handler, workers=1, size=1, policy='spill', max_spill=2)
+        ingest.start()
+        for message_id in range(1, 7):
+            await ingest.put('key', Event('create', 1, 10, message_id))
+            await asyncio.sleep(0)
+        depth = ingest.depth
+        # submit() waits for the overflow to have room instead of dropping
+        waiting = asyncio.create_task(ingest.submit('key', Event('create', 1, 10, 7)))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        release.set()
+        await (await waiting)
+        await ingest.close()
+        return depth, handled, ingest.stats()
+
+    depth, handled, stats = asyncio.run(run())
+    # One event in the worker, one in the queue and two in the overflow
+    assert depth == 3
+    assert handled == [1, 2, 3, 4, 7]
+    assert (stats['spilled'], stats['dropped']) == (2, 2)
@@ -0,0 +1,87 @@
+import asyncio
+import random
+from types import SimpleNamespace
+import discord
+from cogs.utils.database import DatabaseManager
+from cogs.utils.leaderboard import METRICS, Leaderboard, LeaderboardPaginator
+from cogs.utils.metrics import create_metrics
+from cogs.utils.write_buffer import WriteBuffer
+
+GUILDS, CHANNELS, USERS = (1, 2), (10, 11, 12), range(100, 140)
+
+async def counts(db, guild_id, channel_id):
+    """(count(), what a full scan counts) of every metric"""
+    table, where, args = ('metrics_user', 'guild_id = ?', (guild_id,)) if channel_id is None else ('metrics', 'guild_id = ? AND channel_id = ?', (guild_id, channel_id))
+    result = []
+    for metric in METRICS:
+        async with db.reader('metrics.db') as conn:
+            async with conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {where} AND {metric} > 0', args) as cursor:
+                scanned = (await cursor.fetchone())[0]
+        result.append((await Leaderboard(db, guild_id, metric, channel_id).count(), scanned))
+    return result
+
+def test_ranked_counts_follow_every_change(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = random.Random(0)
+
+    async def run():
+        db = DatabaseManager()
+        try:
+            async with db.writer('metrics.db') as conn:
+                await create_metrics(conn)
+            buffer = WriteBuffer(db)
+            for _ in range(20):
+                for _ in range(200):
+                    key = (rng.choice(GUILDS), rng.choice(USERS), rng.choice(CHANNELS))
+                    buffer.add('metrics', key, *(rng.randint(-5, 5) for _ in METRICS))
+                await buffer.flush()
+                async with db.writer('metrics.db') as conn:
+                    # The statements /count reset and a purge run
+                    await conn.execute('UPDATE metrics SET words = 0 WHERE guild_id = ? AND user_id = ?', (rng.choice(GUILDS), rng.choice(USERS)))
+                    await conn.execute('DELETE FROM metrics WHERE guild_id = ? AND channel_id = ? AND user_id = ?', (rng.choice(GUILDS), rng.choice(CHANNELS), rng.choice(USERS)))
+                for guild_id in GUILDS:
+                    for channel_id in (None, *CHANNELS):
+                        for count, scanned in await counts(db, guild_id, channel_id):
+                            assert count == scanned
+
+            # A database from before metrics_ranked gets it filled in from its rows
+            async with db.writer('metrics.db') as conn:
+                await conn.execute('DROP TABLE metrics_ranked')
+                await create_metrics(conn)
+            for guild_id in GUILDS:
+                for channel_id in (None, *CHANNELS):
+                    for count, scanned in await counts(db, guild_id, channel_id):
+                        assert count == scanned
+            assert await Leaderboard(db, 3, 'words').count() == 0
+        finally:
+            await db.close()
+
+    asyncio.run(run())
+
+def test_pages_skip_members_who_left(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    members = {100: SimpleNamespace(display_name='alice'), 102: SimpleNamespace(display_name='carol')}
+    guild = SimpleNamespace(get_member=members.get)
+
+    async def run():
+        db = DatabaseManager()
+        try:
+            async with db.writer('metrics.db') as conn:
+                await create_metrics(conn)
+            buffer = WriteBuffer(db)
+            for user_id, words in ((100, 30), (101, 20), (102, 10)):
+                buffer.add('metrics', (1, user_id, 10), words, 1, 0)
+            await buffer.flush()
+            leaderboard = Leaderboard(db, 1, 'words')
+            paginator = LeaderboardPaginator(
+                leaderboard, guild, await leaderboard.count(), title='Words', description='Top', unit='words',
+                color=discord.Color.red(), rank=await leaderboard.rank_of(102),
+            )
+            return await paginator.format_page(0)
+        finally:
+            await db.close()
+
+    embed = asyncio.run(run())
+    # Bob left, Carol keeps the rank the footer gives her
+    assert embed.description.splitlines()[2:] == ['🥇 **alice** - 30 words', '🥉 **carol** - 10 words']
+    assert embed.footer.text.endswith('Your rank: #3 (10 words)')
@@ -0,0 +1,44 @@
+import asyncio
+from datetime import timedelta
+import discord
+from cogs.utils.backfill import BACKFILL_DB, BackfillJob, create_checkpoints, reset_checkpoints
+from cogs.utils.ingest import Event
+from fakes import running_bot
+from test_backfill import FakeHistory, channel, message, totals
+
+GUILD, CHANNEL, ALICE = 1, 10, 100
+
+def test_flush_drops_entries_past_the_retention_window(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    now = discord.utils.utcnow()
+    old, recent = (discord.utils.time_snowflake(now - timedelta(days=days)) for days in (30, 1))
+    counted = channel(CHANNEL)
+    history = FakeHistory([message(counted, old, ALICE, 'one two'), message(counted, recent, ALICE, 'three')])
+
+    async def run():
+        async with running_bot() as bot:
+            bot.ledger.retention_days = 14
+            bot.config.add_channel(GUILD, CHANNEL)
+            await create_checkpoints(bot.db)
+            async with bot.db.writer(BACKFILL_DB) as conn:
+                await conn.execute('INSERT INTO counting_started VALUES (?, ?, ?)', (GUILD, CHANNEL, discord.utils.time_snowflake(now)))
+            await BackfillJob(bot, GUILD, [counted], history=history).run()
+            kept = await bot.fetch('ledger.db', 'SELECT message_id FROM ledger')
+            pruned = bot.ledger.pruned
+            first = await totals(bot)
+
+            # Without the ledger entry, a restarted backfill still knows the old message was counted
+            await reset_checkpoints(bot.db, GUILD)
+            again = BackfillJob(bot, GUILD, [counted], history=history)
+            await again.run()
+
+            # Deleting a message past the window leaves the counters alone
+            await bot.cogs['Counter'].process_event(Event('delete', GUILD, CHANNEL, old))
+            await bot.write_buffer.flush()
+            return kept, pruned, first, again.stats()['counted'], await totals(bot)
+
+    kept, pruned, first, recounted, second = asyncio.run(run())
+    assert kept == [(recent,)]
+    assert pruned == 1
+    assert first == second == [(CHANNEL, ALICE, 3, 2, 0)]
+    assert recounted == 0
@@ -0,0 +1,38 @@
+import asyncio
+import sqlite3
+import pytest
+from cogs.utils.database import DatabaseManager
+from cogs.utils.metrics import create_metrics, migrate_legacy
+
+def legacy_table(path, table, column, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(f'CREATE TABLE {table} (guild_id INTEGER, user_id INTEGER, channel_id INTEGER, {column} INTEGER)')
+    conn.executemany(f'INSERT INTO {table} VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+async def start():
+    db = DatabaseManager()
+    try:
+        async with db.writer('metrics.db') as conn:
+            await create_metrics(conn)
+            await migrate_legacy(conn)
+    finally:
+        async with db.reader('metrics.db') as conn:
+            async with conn.execute('SELECT guild_id, user_id, words, messages, attachments FROM metrics_user') as cursor:
+                rows = await cursor.fetchall()
+        await db.close()
+    return rows
+
+def test_failed_migration_imports_nothing_twice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    legacy_table('counter.db', 'counters', 'count', [(1, 2, 3, 100)])
+    (tmp_path / 'message_channels.db').write_bytes(b'not a database' * 100)
+
+    with pytest.raises(sqlite3.DatabaseError):
+        asyncio.run(start())
+
+    (tmp_path / 'message_channels.db').unlink()
+    legacy_table('message_channels.db', 'message_channels', 'messages', [(1, 2, 3, 7)])
+    assert asyncio.run(start()) == [(1, 2, 100, 7, 0)]
+    assert asyncio.run(start()) == [(1, 2, 100, 7, 0)]
@@ -0,0 +1,43 @@
+import asyncio
+from cogs.utils.ingest import Event
+from fakes import running_bot
+
+GUILD, USER = 1, 2
+CHANNELS = (10, 11, 12, 13)
+
+def test_simultaneous_messages_of_one_user(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run():
+        async with running_bot() as bot:
+            bot.config.add_keyword(GUILD, 'hi')
+            # Flushes keep starting while the workers are still adding to the same user
+            bot.write_buffer.max_pending = 1
+            bot.write_buffer.interval = 0.001
+            bot.write_buffer.start()
+            counter = bot.cogs['Counter']
+            done = []
+            for message_id in range(1, 801):
+                channel_id = CHANNELS[message_id % len(CHANNELS)]
+                # Every channel is its own ingest key, so several workers handle this user at once
+                done.append(await counter.ingest.submit((GUILD, channel_id), Event(
+                    'create', GUILD, channel_id, message_id, USER, 'hi there ' * (message_id % 3), message_id % 2
+                )))
+            await asyncio.gather(*done)
+            await bot.write_buffer.flush()
+            return (
+                await bot.fetch('metrics.db', 'SELECT channel_id, words, messages, attachments FROM metrics ORDER BY channel_id'),
+                await bot.fetch('metrics.db', 'SELECT user_id, words, messages, attachments FROM metrics_user'),
+                await bot.fetch('keyword_user.db', 'SELECT keyword, count FROM keyword_user'),
+            )
+
+    metrics, metrics_user, keywords = asyncio.run(run())
+    ids = range(1, 801)
+    words = sum(2 * (message_id % 3) for message_id in ids)
+    attachments = sum(message_id % 2 for message_id in ids)
+    assert metrics == [
+        (channel_id, sum(2 * (m % 3) for m in ids if CHANNELS[m % 4] == channel_id), 200, sum(m % 2 for m in ids if CHANNELS[m % 4] == channel_id))
+        for channel_id in CHANNELS
+    ]
+    assert metrics_user == [(USER, words, 800, attachments)]
+    assert keywords == [('hi', words // 2)]
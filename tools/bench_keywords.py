@@ -0,0 +1,61 @@
+"""Per-message cost of keyword matching as the number of keywords grows.
+
+    python tools/bench_keywords.py [--messages 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.utils.keyword_matcher import KeywordMatcher
+from cogs.utils.message_analysis import MessageAnalysis
+
+def random_word(rng: random.Random) -> str:
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8)))
+
+def naive_count(keywords, content: str) -> dict:
+    # What Keyword.keyword_message used to do, one lowercase and split per keyword
+    counts = {}
+    for keyword in keywords:
+        count = content.lower().split().count(keyword.lower())
+        if count:
+            counts[keyword] = count
+    return counts
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [random_word(rng) for _ in range(20000)]
+    messages = [' '.join(rng.choices(vocabulary, k=rng.randint(3, 40))) for _ in range(args.messages)]
+
+    print(f'{"keywords":>9} {"matcher us/msg":>15} {"naive us/msg":>13}')
+    for size in (10, 100, 1000, 10000):
+        keywords = rng.sample(vocabulary, size)
+        # A tenth of the keywords are two word phrases
+        keywords += [f'{rng.choice(vocabulary)} {rng.choice(vocabulary)}' for _ in range(size // 10)]
+        matcher = KeywordMatcher(keywords)
+
+        start = time.perf_counter()
+        for content in messages:
+            MessageAnalysis(content).keyword_counts(matcher)
+        matched = (time.perf_counter() - start) / len(messages) * 1e6
+
+        # The naive loop gets slow quickly, time it on a sample
+        sample = messages[:max(1, len(messages) * 10 // size)]
+        start = time.perf_counter()
+        for content in sample:
+            naive_count(keywords, content)
+        naive = (time.perf_counter() - start) / len(sample) * 1e6
+
+        print(f'{size:>9} {matched:>15.1f} {naive:>13.1f}')
+
+if __name__ == '__main__':
+    main()
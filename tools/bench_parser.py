@@ -0,0 +1,116 @@
+"""Throughput, peak memory and time to first progress update of the chat export parser modes.
+
+    python tools/bench_parser.py [--messages 1000,100000] [--modes stream,tree,chunked] [--processes 4]
+    python tools/bench_parser.py --export path/to/export.html
+
+Exports are generated with tools/generate_export.py unless one is given. Every mode runs in a
+fresh process so peak RSS is its own.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.utils.analysis_pool import ProgressReporter
+from cogs.utils.chat_analyzer import analyze_export_file, build_analysis, merge_datasets, split_export_file
+from generate_export import write_export
+
+MODES = ('stream', 'tree', 'chunked')
+
+def peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+def run_mode(path: str, mode: str, processes: int, results) -> None:
+    first_progress = None
+    start = time.perf_counter()
+
+    def progress(*update) -> None:
+        nonlocal first_progress
+        if first_progress is None:
+            first_progress = time.perf_counter() - start
+
+    if mode == 'chunked':
+        manager = multiprocessing.Manager()
+        channel = manager.Queue()
+
+        def wait_for_progress() -> None:
+            if channel.get() is not None:
+                progress()
+        waiter = threading.Thread(target=wait_for_progress)
+        waiter.start()
+        start = time.perf_counter()
+        with ProcessPoolExecutor(processes) as executor:
+            futures = [
+                executor.submit(analyze_export_file, path, True, ProgressReporter(channel, key, interval=0), chunk_start, chunk_end)
+                for key, (chunk_start, chunk_end) in enumerate(split_export_file(path, processes))
+            ]
+            dataset = merge_datasets(future.result() for future in futures)
+        channel.put(None)
+        waiter.join()
+        manager.shutdown()
+    else:
+        dataset = analyze_export_file(path, mode == 'stream', progress)
+    parsed = time.perf_counter() - start
+    build_analysis(dataset)
+    aggregated = time.perf_counter() - start - parsed
+
+    results.put({
+        'messages': len(dataset),
+        'parse': parsed,
+        'aggregate': aggregated,
+        'first_progress': first_progress,
+        'rss': peak_rss_mb(resource.RUSAGE_SELF),
+        'worker_rss': peak_rss_mb(resource.RUSAGE_CHILDREN) if mode == 'chunked' else None,
+    })
+
+def bench(path: str, modes, processes: int) -> None:
+    context = multiprocessing.get_context('spawn')
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    for mode in modes:
+        results = context.Queue()
+        process = context.Process(target=run_mode, args=(path, mode, processes, results))
+        process.start()
+        result = results.get()
+        process.join()
+        first = f'{result["first_progress"]:.2f}' if result['first_progress'] is not None else '-'
+        worker_rss = f'{result["worker_rss"]:.0f}' if result['worker_rss'] is not None else '-'
+        print(
+            f'{result["messages"]:>10} {size_mb:>8.1f} {mode:>8} {result["messages"] / result["parse"]:>10.0f} '
+            f'{result["parse"]:>8.2f} {result["aggregate"]:>8.3f} {first:>9} {result["rss"]:>7.0f} {worker_rss:>10}'
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', default='1000,100000', help='comma separated export sizes to generate')
+    parser.add_argument('--export', help='benchmark this export instead of generated ones')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='workers of the chunked mode')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    modes = args.modes.split(',')
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f'unknown mode {mode!r}, expected some of {", ".join(MODES)}')
+
+    print(f'{"messages":>10} {"MB":>8} {"mode":>8} {"msg/s":>10} {"parse s":>8} {"agg s":>8} {"first s":>9} {"rss MB":>7} {"worker MB":>10}')
+    if args.export:
+        bench(args.export, modes, args.processes)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        for messages in (int(size) for size in args.messages.split(',')):
+            path = os.path.join(directory, f'export-{messages}.html')
+            write_export(path, messages, seed=args.seed)
+            bench(path, modes, args.processes)
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Writes a synthetic DiscordChatExporter HTML export for benchmarking the chat analyzer.
+
+    python tools/generate_export.py export.html [--messages 100000] [--users 200] [--max-group 5]
+
+The markup has everything cogs/utils/chat_analyzer.py looks at: author groups of several
+messages, authors with a data-user-id, both timestamp formats, the short timestamps of
+follow-up messages, embeds, attachments, BOT tags and message ids.
+"""
+import argparse
+import html
+import random
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+DISCORD_EPOCH_MS = 1420070400000
+
+HEADER = '''<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>Synthetic Guild - general</title></head>
+<body>
+<div class="preamble"><div class="preamble__entries-container"><div class="preamble__entry">Synthetic Guild</div><div class="preamble__entry">general</div></div></div>
+<div class="chatlog">
+'''
+
+FOOTER = '''</div>
+<div class="postamble"><div class="postamble__entry">Exported {count} message(s)</div></div>
+</body>
+</html>
+'''
+
+WORDS = (
+    'the', 'a', 'and', 'to', 'of', 'is', 'it', 'that', 'for', 'on', 'you', 'this', 'with', 'was', 'lol',
+    'game', 'server', 'tonight', 'anyone', 'playing', 'ranked', 'build', 'patch', 'update', 'nerf',
+    'gg', 'wp', 'ping', 'voice', 'stream', 'clip', 'meme', 'bot', 'discord', 'emoji', 'thanks', 'ok',
+    'café', 'naïve', 'über', '<script>', 'R&D', '"quoted"',
+)
+
+def snowflake(date: datetime, sequence: int) -> int:
+    return (int(date.timestamp() * 1000) - DISCORD_EPOCH_MS) << 22 | sequence % 4096
+
+def message_text(rng: random.Random) -> str:
+    words = [html.escape(word) for word in rng.choices(WORDS, k=rng.randint(0, 30))]
+    if len(words) > 2 and rng.random() < 0.2:
+        index = rng.randrange(len(words))
+        words[index] = f'<strong>{words[index]}</strong>'
+    if rng.random() < 0.05:
+        words.append('<a href="https://example.com/clip">https://example.com/clip</a>')
+    return ' '.join(words)
+
+def message_body(rng: random.Random, message_id: int) -> str:
+    attachments = ''.join(
+        f'<div class="chatlog__attachment"><a href="https://cdn.example.com/attachments/{message_id}/{index}.png">'
+        f'<img class="chatlog__attachment-media" src="https://cdn.example.com/attachments/{message_id}/{index}.png" alt="Image attachment"></a></div>'
+        for index in range(rng.choices((0, 1, 2, 3), weights=(85, 10, 4, 1))[0])
+    )
+    embed = ''
+    if rng.random() < 0.05:
+        embed = (
+            '<div class="chatlog__embed"><div class="chatlog__embed-content-container"><div class="chatlog__embed-content"><div class="chatlog__embed-text">'
+            '<div class="chatlog__embed-title"><div class="chatlog__markdown chatlog__markdown-preserve">Embed title</div></div>'
+            f'<div class="chatlog__embed-description"><div class="chatlog__markdown chatlog__markdown-preserve">{message_text(rng)}</div></div>'
+            '</div></div></div></div>'
+        )
+    return f'<div class="chatlog__content chatlog__markdown"><span class="chatlog__markdown-preserve">{message_text(rng)}</span></div>{attachments}{embed}'
+
+def message_group(rng: random.Random, messages: List[Tuple[int, datetime]], user: int, is_bot: bool) -> str:
+    """A run of (message id, date) messages by one author, only the first one carries the header"""
+    # The two timestamp formats DiscordChatExporter has used over the years
+    timestamp_format = '%d/%m/%Y %H:%M' if rng.random() < 0.5 else '%d-%m-%Y %H:%M:%S'
+    tag = '<span class="chatlog__author-tag">BOT</span>' if is_bot else ''
+    parts = ['<div class="chatlog__message-group">']
+    for index, (message_id, date) in enumerate(messages):
+        parts.append(
+            f'<div id="chatlog__message-container-{message_id}" class="chatlog__message-container" data-message-id="{message_id}">'
+            f'<div class="chatlog__message">'
+        )
+        if index == 0:
+            parts.append(
+                f'<div class="chatlog__message-aside"><img class="chatlog__avatar" src="https://cdn.example.com/avatars/{user}.png" alt="Avatar"></div>'
+                f'<div class="chatlog__message-primary">'
+                f'<div class="chatlog__header"><span class="chatlog__author" title="user{user}" data-user-id="{user}">user{user}</span>{tag} '
+                f'<span class="chatlog__timestamp"><a href="#chatlog__message-container-{message_id}">{date.strftime(timestamp_format)}</a></span></div>'
+            )
+        else:
+            parts.append(
+                f'<div class="chatlog__message-aside"><div class="chatlog__short-timestamp" title="{date.strftime(timestamp_format)}">{date.strftime("%H:%M")}</div></div>'
+                f'<div class="chatlog__message-primary">'
+            )
+        parts.append(f'{message_body(rng, message_id)}</div></div></div>')
+    parts.append('</div>\n')
+    return ''.join(parts)
+
+def write_export(path: str, messages: int, *, users: int = 200, bots: float = 0.02, max_group: int = 5, start: datetime = datetime(2021, 1, 1),
+                 days: int = 730, seed: int = 0) -> None:
+    """Writes ``messages`` messages in chronological order, in groups of 1 to ``max_group`` by one author like
+    DiscordChatExporter puts consecutive messages, streamed so any size fits in memory"""
+    rng = random.Random(seed)
+    user_ids = [rng.randrange(10 ** 17, 10 ** 18) for _ in range(users)]
+    bot_ids = set(rng.sample(user_ids, max(1, int(users * bots))))
+    # A few users write most of the messages, like on a real server
+    weights = [1 / (rank + 1) for rank in range(users)]
+    # Short runs are the most common
+    group_weights = [1 / size for size in range(1, max_group + 1)]
+    step = timedelta(days=days) / max(messages, 1)
+    with open(path, 'w', encoding='utf-8', buffering=1024 * 1024) as file:
+        file.write(HEADER)
+        index = 0
+        while index < messages:
+            size = min(rng.choices(range(1, max_group + 1), group_weights)[0], messages - index)
+            group = []
+            for offset in range(index, index + size):
+                date = (start + step * offset).replace(microsecond=0)
+                group.append((snowflake(date, offset), date))
+            user = rng.choices(user_ids, weights)[0]
+            file.write(message_group(rng, group, user, user in bot_ids))
+            index += size
+        file.write(FOOTER.format(count=messages))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--max-group', type=int, default=5, help='most messages one author group holds')
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_export(args.path, args.messages, users=args.users, max_group=args.max_group, days=args.days, seed=args.seed)
+
+if __name__ == '__main__':
+    main()